@@ -171,6 +171,10 @@ class LargeScaleTerrainConf:
     geo_cm_coarse_interpolation_method: str = "bicubic"
     geo_cm_fine_acceleration_mode: str = "hybrid"
     geo_cm_coarse_acceleration_mode: str = "gpu"
+    geo_cm_fine_dem_precision: str = "float32"
+    geo_cm_coarse_dem_precision: str = "float32"
+    geo_cm_transpose_dem: bool = True
+    geo_cm_use_cuda_graph: bool = True
     geo_cm_apply_smooth_shading: bool = False
     geo_cm_semantic_label: str = "terrain"
     geo_cm_texture_name: str = "LunarRegolith8k"
@@ -391,6 +395,16 @@ class LargeScaleTerrainConf:
             "hybrid",
             "gpu",
         ], "geo_cm_coarse_acceleration_mode must be either 'hybrid' or 'gpu'."
+        assert self.geo_cm_fine_dem_precision in [
+            "float32",
+            "int16",
+        ], "geo_cm_fine_dem_precision must be either 'float32' or 'int16'."
+        assert self.geo_cm_coarse_dem_precision in [
+            "float32",
+            "int16",
+        ], "geo_cm_coarse_dem_precision must be either 'float32' or 'int16'."
+        assert type(self.geo_cm_transpose_dem) == bool, "geo_cm_transpose_dem must be a boolean."
+        assert type(self.geo_cm_use_cuda_graph) == bool, "geo_cm_use_cuda_graph must be a boolean."
         assert type(self.geo_cm_apply_smooth_shading) == bool, "geo_cm_apply_smooth_shading must be a boolean."
 
         self.NGCMMConf_D = {
@@ -400,6 +414,10 @@ class LargeScaleTerrainConf:
             "coarse_interpolation_method": self.geo_cm_coarse_interpolation_method,
             "fine_acceleration_mode": self.geo_cm_fine_acceleration_mode,
             "coarse_acceleration_mode": self.geo_cm_coarse_acceleration_mode,
+            "fine_dem_precision": self.geo_cm_fine_dem_precision,
+            "coarse_dem_precision": self.geo_cm_coarse_dem_precision,
+            "transpose_dem": self.geo_cm_transpose_dem,
+            "use_cuda_graph": self.geo_cm_use_cuda_graph,
             "profiling": self.profiling,
             "semantic_label": self.geo_cm_semantic_label,
             "texture_name": self.geo_cm_texture_name,
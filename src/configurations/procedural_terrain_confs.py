@@ -209,6 +209,9 @@ class DeformationEngineConf:
         depth_distribution (dict): Deformation depth distribution parameters.
         force_depth_regression (dict): Force depth regression parameters.
         num_links (int): Total number of links = num_robot * num_target_links.
+        force_threshold (float): Normal force below which a link does not deform the terrain. It is compared to
+            the contact forces given to the deformation engine, in Lunalab these are the measured forces (N)
+            scaled by 10. If no link reaches it, the deformation step is skipped.
     """
 
     enable: bool = False
@@ -223,6 +226,7 @@ class DeformationEngineConf:
     depth_distribution: DepthDistributionConf = dataclasses.field(default_factory=dict)
     force_depth_regression: ForceDepthRegressionConf = dataclasses.field(default_factory=dict)
     num_links: int = 4
+    force_threshold: float = 0.0
 
     def __post_init__(self):
         assert type(self.delay) is float, "delay must be float"
@@ -232,6 +236,7 @@ class DeformationEngineConf:
         assert self.terrain_width > 0, "terrain_width must be greater than 0"
         assert self.terrain_height > 0, "terrain_height must be greater than 0"
         assert self.num_links > 0, "num_links must be greater than 0"
+        assert self.force_threshold >= 0, "force_threshold must be greater than or equal to 0"
 
         self.footprint = FootprintConf(**self.footprint)
         self.deform_constrain = DeformConstrainConf(**self.deform_constrain)
@@ -272,6 +277,7 @@ class TerrainManagerConf:
     sim_width: int = dataclasses.field(default_factory=int)
     resolution: float = dataclasses.field(default_factory=float)
     augmentation: bool = False
+    use_fabric: bool = False
 
     def __post_init__(self):
         self.moon_yard = MoonYardConf(**self.moon_yard)
@@ -282,6 +288,7 @@ class TerrainManagerConf:
         assert type(self.sim_length) is float, "sim_length must be a float"
         assert type(self.sim_width) is float, "sim_width must be a float"
         assert type(self.resolution) is float, "resolution must be a float"
+        assert type(self.use_fabric) is bool, "use_fabric must be a boolean"
 
         assert len(self.mesh_position) == 3, "mesh_position must be a tuple of length 3"
         assert len(self.mesh_orientation) == 4, "mesh_orientation must be a tuple of length 4"
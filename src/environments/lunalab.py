@@ -12,7 +12,7 @@ import numpy as np
 from omni.isaac.core.utils.stage import open_stage, add_reference_to_stage
 import omni
 
-from pxr import UsdGeom, UsdLux, Gf, Usd
+from pxr import UsdGeom, UsdLux, Gf, Usd, Sdf
 
 from src.physics.terramechanics_parameters import RobotParameter, TerrainMechanicalParameter
 from src.terrain_management.large_scale_terrain.pxr_utils import set_xform_ops
@@ -54,6 +54,11 @@ class LunalabController(BaseEnv):
 
         super().__init__(**kwargs)
         self.stage_settings = lunalab_settings
+        # The paths of the interactive elements are parsed once.
+        self._projector_path = Sdf.Path(self.stage_settings.projector_path)
+        self._projector_shader_path = Sdf.Path(self.stage_settings.projector_shader_path)
+        self._room_lights_path = Sdf.Path(self.stage_settings.room_lights_path)
+        self._curtains_path = {key: Sdf.Path(path) for key, path in self.stage_settings.curtains_path.items()}
         self.T = TerrainManager(terrain_manager)
         self.RM = RockManager(**rocks_settings)
         self.TS = TerramechanicsSolver(
@@ -64,6 +69,9 @@ class LunalabController(BaseEnv):
         self.mask = None
         self.scene_name = "/Lunalab"
         self.deformation_conf = terrain_manager.moon_yard.deformation_engine
+        self._rg_slices = []
+        self._has_robots = False
+        self._last_projector_pose = None
 
     def build_scene(self) -> None:
         """
@@ -107,7 +115,8 @@ class LunalabController(BaseEnv):
         self.collect_interactive_assets()
         self.RM.build(self.dem, self.mask)
         # Loads the DEM and the mask
-        self.switch_terrain(0)
+        self.switch_terrain(0, randomize_rocks=False)
+        self.RM.randomizeInstancers(10)
 
     def add_robot_manager(self, robotManager: RobotManager) -> None:
         """
@@ -118,10 +127,35 @@ class LunalabController(BaseEnv):
         """
 
         self.robotManager = robotManager
+        self._has_robots = True
+        self.build_robot_buffers()
+
+    def build_robot_buffers(self) -> None:
+        """
+        Preallocates the buffers used to gather the state of the robots' target links.
+        The buffers are laid out as one contiguous array per quantity, and each rigid group
+        is assigned a fixed slice of them. This avoids growing lists and concatenating arrays
+        every time the terrain is deformed, and allows to run the terramechanics solver once
+        for all the robots.
+        """
+
+        self._rg_slices = []
+        start = 0
+        for rrg in self.robotManager.robots_RG.values():
+            end = start + len(rrg.target_links)
+            self._rg_slices.append((start, end))
+            start = end
+        self._positions_buffer = np.zeros((start, 3), dtype=np.float32)
+        self._orientations_buffer = np.zeros((start, 4), dtype=np.float32)
+        self._forces_buffer = np.zeros((start, 3), dtype=np.float32)
+        self._linear_velocities_buffer = np.zeros((start, 3), dtype=np.float32)
+        self._angular_velocities_buffer = np.zeros((start, 3), dtype=np.float32)
+        self._sinkages_buffer = np.zeros((start,), dtype=np.float32)
 
     def get_lux_assets(self, prim: "Usd.Prim") -> List[Usd.Prim]:
         """
         Returns the UsdLux prims under a given prim.
+        Inactive and undefined prims are pruned from the traversal by USD itself.
 
         Args:
             prim (Usd.Prim): The prim to be searched.
@@ -130,15 +164,39 @@ class LunalabController(BaseEnv):
             list: A list of UsdLux prims.
         """
 
-        lights = []
-        for prim in Usd.PrimRange(prim):
-            if prim.IsA(UsdLux.SphereLight):
-                lights.append(prim)
-            if prim.IsA(UsdLux.CylinderLight):
-                lights.append(prim)
-            if prim.IsA(UsdLux.DiskLight):
-                lights.append(prim)
-        return lights
+        prim_range = Usd.PrimRange(prim, Usd.PrimIsActive & Usd.PrimIsDefined)
+        return [child for child in prim_range if child.HasAPI(UsdLux.LightAPI)]
+
+    @staticmethod
+    def get_attributes(prims: List[Usd.Prim], names: List[str]) -> Dict[str, List[Usd.Attribute]]:
+        """
+        Fetches the attributes of a list of prims, such that they do not have to be looked up by name
+        every time they are modified.
+
+        Args:
+            prims (List[Usd.Prim]): The prims to fetch the attributes from.
+            names (List[str]): The names of the attributes to be fetched.
+
+        Returns:
+            Dict[str, List[Usd.Attribute]]: The attributes of the prims, indexed by name.
+        """
+
+        return {name: [prim.GetAttribute(name) for prim in prims] for name in names}
+
+    @staticmethod
+    def set_attribute_batch(attributes: List[Usd.Attribute], value) -> None:
+        """
+        Sets the same value to a list of attributes.
+        The change notifications are batched, such that the stage is recomposed once.
+
+        Args:
+            attributes (List[Usd.Attribute]): The attributes to be set.
+            value (Any): The value to be set.
+        """
+
+        with Sdf.ChangeBlock():
+            for attribute in attributes:
+                attribute.Set(value)
 
     def load_DEM(self) -> None:
         """
@@ -148,24 +206,45 @@ class LunalabController(BaseEnv):
         self.dem = self.T.getDEM()
         self.mask = self.T.getMask()
 
+    def _refresh_terrain(self) -> None:
+        """
+        Loads the DEM and the mask from the TerrainManager and forwards them to the RockManager.
+        The TerrainManager hands out references to its arrays, so no copy is made.
+        """
+
+        self.load_DEM()
+        self.RM.updateImageData(self.dem, self.mask)
+
     def collect_interactive_assets(self) -> None:
         """
         Collects the interactive assets from the stage and assigns them to class variables.
         """
 
         # Projector
-        self._projector_prim = self.stage.GetPrimAtPath(self.stage_settings.projector_path)
+        self._projector_prim = self.stage.GetPrimAtPath(self._projector_path)
         self._projector_xform = UsdGeom.Xformable(self._projector_prim)
+        self._last_projector_pose = None
         self._projector_lux = self.get_lux_assets(self._projector_prim)
-        self._projector_flare = self.stage.GetPrimAtPath(self.stage_settings.projector_shader_path)
+        self._projector_flare = self.stage.GetPrimAtPath(self._projector_shader_path)
+        self._projector_lux_attributes = self.get_attributes(self._projector_lux[:1], ["intensity", "radius", "color"])
+        self._projector_flare_attributes = self.get_attributes(
+            [self._projector_flare], ["inputs:emissive_color", "inputs:diffuse_color_constant", "inputs:diffuse_tint"]
+        )
+        self._projector_visibility = self._projector_prim.GetAttribute("visibility")
         # Room Lights
-        self._room_lights_prim = self.stage.GetPrimAtPath(self.stage_settings.room_lights_path)
+        self._room_lights_prim = self.stage.GetPrimAtPath(self._room_lights_path)
         self._room_lights_xform = UsdGeom.Xformable(self._room_lights_prim)
         self._room_lights_lux = self.get_lux_assets(self._room_lights_prim)
+        self._room_lights_attributes = self.get_attributes(
+            self._room_lights_lux, ["intensity", "radius", "shaping:cone:angle", "color"]
+        )
+        self._room_lights_visibility = self._room_lights_prim.GetAttribute("visibility")
         # Curtains
         self._curtain_prims: Dict[str, Usd.Prim] = {}
-        for key in self.stage_settings.curtains_path.keys():
-            self._curtain_prims[key] = self.stage.GetPrimAtPath(self.stage_settings.curtains_path[key])
+        self._curtain_visibility: Dict[str, Usd.Attribute] = {}
+        for key, path in self._curtains_path.items():
+            self._curtain_prims[key] = self.stage.GetPrimAtPath(path)
+            self._curtain_visibility[key] = self._curtain_prims[key].GetAttribute("visibility")
 
     # ==============================================================================
     # Projector control
@@ -183,6 +262,12 @@ class LunalabController(BaseEnv):
             quat (Tuple[float,float,float,float]): The quaternion of the projector. (w,x,y,z)
         """
 
+        pose = (tuple(position), tuple(orientation))
+        # Re-authoring an identical pose would still dirty the transforms of the projector.
+        if pose == self._last_projector_pose:
+            return
+        self._last_projector_pose = pose
+
         w, x, y, z = (orientation[0], orientation[1], orientation[2], orientation[3])
         px, py, pz = (position[0], position[1], position[2])
 
@@ -198,7 +283,7 @@ class LunalabController(BaseEnv):
             intensity (float): The intensity of the projector (arbitrary unit).
         """
 
-        self._projector_lux[0].GetAttribute("intensity").Set(intensity)
+        self.set_attribute_batch(self._projector_lux_attributes["intensity"], intensity)
 
     def set_projector_radius(self, radius: float = 0.1) -> None:
         """
@@ -208,7 +293,7 @@ class LunalabController(BaseEnv):
             radius (float): The radius of the projector (in meters).
         """
 
-        self._projector_lux[0].GetAttribute("radius").Get(radius)
+        self.set_attribute_batch(self._projector_lux_attributes["radius"], radius)
 
     def set_projector_color(self, color: Tuple[float, float, float] = (1.0, 1.0, 1.0)) -> None:
         """
@@ -219,10 +304,12 @@ class LunalabController(BaseEnv):
         """
 
         color = Gf.Vec3d(color[0], color[1], color[2])
-        self._projector_flare.GetAttribute("inputs:emissive_color").Set(color)
-        self._projector_flare.GetAttribute("inputs:diffuse_color_constant").Set(color)
-        self._projector_flare.GetAttribute("inputs:diffuse_tint").Set(color)
-        self._projector_lux[0].GetAttribute("color").Set(color)
+        # Batches the change notifications of all the attributes.
+        with Sdf.ChangeBlock():
+            self.set_attribute_batch(self._projector_flare_attributes["inputs:emissive_color"], color)
+            self.set_attribute_batch(self._projector_flare_attributes["inputs:diffuse_color_constant"], color)
+            self.set_attribute_batch(self._projector_flare_attributes["inputs:diffuse_tint"], color)
+            self.set_attribute_batch(self._projector_lux_attributes["color"], color)
 
     def turn_projector_on_off(self, flag: bool = True) -> None:
         """
@@ -232,10 +319,7 @@ class LunalabController(BaseEnv):
             flag (bool): True to turn the projector on, False to turn it off.
         """
 
-        if flag:
-            self._projector_prim.GetAttribute("visibility").Set("visible")
-        else:
-            self._projector_prim.GetAttribute("visibility").Set("invisible")
+        self._projector_visibility.Set("visible" if flag else "invisible")
 
     # ==============================================================================
     # Room lights control
@@ -248,8 +332,7 @@ class LunalabController(BaseEnv):
             intensity (float): The intensity of the room lights (arbitrary unit).
         """
 
-        for light in self._room_lights_lux:
-            light.GetAttribute("intensity").Set(intensity)
+        self.set_attribute_batch(self._room_lights_attributes["intensity"], intensity)
 
     def set_room_lights_radius(self, radius: float = 0.1) -> None:
         """
@@ -259,8 +342,7 @@ class LunalabController(BaseEnv):
             radius (float): The radius of the room lights (in meters).
         """
 
-        for light in self._room_lights_lux:
-            light.GetAttribute("radius").Set(radius)
+        self.set_attribute_batch(self._room_lights_attributes["radius"], radius)
 
     def set_room_lights_FOV(self, FOV: float = 42.0) -> None:
         """
@@ -270,8 +352,7 @@ class LunalabController(BaseEnv):
             FOV (float): The FOV of the room lights (in degrees).
         """
 
-        for light in self._room_lights_lux:
-            light.GetAttribute("shaping:cone:angle").Set(FOV)
+        self.set_attribute_batch(self._room_lights_attributes["shaping:cone:angle"], FOV)
 
     def set_room_lights_color(self, color: Tuple[float, float, float] = (1.0, 1.0, 1.0)) -> None:
         """
@@ -282,8 +363,7 @@ class LunalabController(BaseEnv):
         """
 
         color = Gf.Vec3d(color[0], color[1], color[2])
-        for light in self._room_lights_lux:
-            light.GetAttribute("color").Set(color)
+        self.set_attribute_batch(self._room_lights_attributes["color"], color)
 
     def turn_room_lights_on_off(self, flag: bool = True) -> None:
         """
@@ -293,10 +373,7 @@ class LunalabController(BaseEnv):
             flag (bool): True to turn the room lights on, False to turn them off.
         """
 
-        if flag:
-            self._room_lights_prim.GetAttribute("visibility").Set("visible")
-        else:
-            self._room_lights_prim.GetAttribute("visibility").Set("invisible")
+        self._room_lights_visibility.Set("visible" if flag else "invisible")
 
     # ==============================================================================
     # Curtains control
@@ -310,21 +387,22 @@ class LunalabController(BaseEnv):
         """
 
         if flag:
-            self._curtain_prims["extended"].GetAttribute("visibility").Set("visible")
-            self._curtain_prims["folded"].GetAttribute("visibility").Set("invisible")
+            self._curtain_visibility["extended"].Set("visible")
+            self._curtain_visibility["folded"].Set("invisible")
         else:
-            self._curtain_prims["extended"].GetAttribute("visibility").Set("invisible")
-            self._curtain_prims["folded"].GetAttribute("visibility").Set("visible")
+            self._curtain_visibility["extended"].Set("invisible")
+            self._curtain_visibility["folded"].Set("visible")
 
     # ==============================================================================
     # Terrain control
     # ==============================================================================
-    def switch_terrain(self, flag: int = -1) -> None:
+    def switch_terrain(self, flag: int = -1, randomize_rocks: bool = True) -> None:
         """
         Switches the terrain to a new DEM.
 
         Args:
             flag (int): The id of the DEM to be loaded. If negative, a random DEM is generated.
+            randomize_rocks (bool): True to randomize the rocks on the new terrain, False to leave them untouched.
         """
 
         if flag < 0:
@@ -332,9 +410,9 @@ class LunalabController(BaseEnv):
         else:
             self.T.loadTerrainId(flag)
 
-        self.load_DEM()
-        self.RM.updateImageData(self.dem, self.mask)
-        self.RM.randomizeInstancers(10)
+        self._refresh_terrain()
+        if randomize_rocks:
+            self.RM.randomizeInstancers(10)
 
     def enable_rocks(self, flag: bool = True) -> None:
         """
@@ -354,46 +432,64 @@ class LunalabController(BaseEnv):
             num (int): The number of rocks to be placed.
         """
 
-        num = int(num)
-        if num == 0:
-            num += 1
-        self.RM.randomizeInstancers(num)
+        self.RM.randomizeInstancers(max(1, int(num)))
 
     def deform_terrain(self) -> None:
         """
         Deforms the terrain.
-        Args:
-            world_poses (np.ndarray): The world poses of the contact points.
-            contact_forces (np.ndarray): The contact forces in local frame reported by rigidprimview.
+        The poses and contact forces of the robots are gathered into preallocated buffers.
+        Each rigid group owns a fixed slice of these buffers, see `build_robot_buffers`.
+        The terrain is not updated if no contact force reaches the deformation engine's force threshold,
+        or if there are no robots in the scene.
         """
-        world_positions = []
-        world_orientations = []
-        contact_forces = []
-        for rrg in self.robotManager.robots_RG.values():
+
+        if not (self._has_robots and self.robotManager.robots_RG):
+            return
+        if len(self.robotManager.robots_RG) != len(self._rg_slices):
+            self.build_robot_buffers()
+        for rrg, (start, end) in zip(self.robotManager.robots_RG.values(), self._rg_slices):
             position, orientation = rrg.get_pose()
-            world_positions.append(position)
-            world_orientations.append(orientation)
-            contact_forces.append(rrg.get_net_contact_forces() * 10)
-        world_positions = np.concatenate(world_positions, axis=0)
-        world_orientations = np.concatenate(world_orientations, axis=0)
-        contact_forces = np.concatenate(contact_forces, axis=0)
-
-        self.T.deformTerrain(
-            world_positions,
-            world_orientations,
-            contact_forces,
+            self._positions_buffer[start:end] = position
+            self._orientations_buffer[start:end] = orientation
+            self._forces_buffer[start:end] = rrg.get_net_contact_forces() * 10
+
+        deformed = self.T.deformTerrain(
+            self._positions_buffer,
+            self._orientations_buffer,
+            self._forces_buffer,
         )
-        self.load_DEM()
-        self.RM.updateImageData(self.dem, self.mask)
+        # Only refresh the DEM and the rock sampler if the terrain was modified.
+        if deformed:
+            self._refresh_terrain()
 
     def apply_terramechanics(self) -> None:
         """
         Applies the terramechanics solver to the robots.
+        The velocities of all the robots are batched such that the solver is called only once.
+        Nothing is done if there are no robots in the scene.
         """
 
-        for rrg in self.robotManager.robots_RG.values():
+        if not (self._has_robots and self.robotManager.robots_RG):
+            return
+        if len(self.robotManager.robots_RG) != len(self._rg_slices):
+            self.build_robot_buffers()
+        for rrg, (start, end) in zip(self.robotManager.robots_RG.values(), self._rg_slices):
+            _, orientation = rrg.get_pose()
             linear_velocities, angular_velocities = rrg.get_velocities()
-            sinkages = np.zeros((linear_velocities.shape[0],))
-            force, torque = self.TS.compute_force_and_torque(linear_velocities, angular_velocities, sinkages)
-            rrg.apply_force_torque(force, torque)
-            rrg.apply_force_torque(force, torque)
+            self._orientations_buffer[start:end] = orientation
+            self._linear_velocities_buffer[start:end] = linear_velocities
+            self._angular_velocities_buffer[start:end] = angular_velocities
+
+        # The solver expects the signed forward velocity and spin rate of each wheel, in the wheel's frame.
+        forward_velocities, spin_rates = self.TS.get_wheel_velocities(
+            self._orientations_buffer,
+            self._linear_velocities_buffer,
+            self._angular_velocities_buffer,
+        )
+        force, torque = self.TS.compute_force_and_torque(
+            forward_velocities,
+            spin_rates,
+            self._sinkages_buffer,
+        )
+        for rrg, (start, end) in zip(self.robotManager.robots_RG.values(), self._rg_slices):
+            rrg.apply_force_torque(force[start:end], torque[start:end])
@@ -79,6 +79,8 @@ class LunaryardController(BaseEnv):
         self.mask = None
         self.scene_name = "/Lunaryard"
         self.deformation_conf = terrain_manager.moon_yard.deformation_engine
+        self._rg_slices = []
+        self._has_robots = False
 
     def build_scene(self) -> None:
         """
@@ -159,13 +161,45 @@ class LunaryardController(BaseEnv):
         # Generates the instancer for the rocks
         self.RM.build(self.dem, self.mask)
         # Loads the DEM and the mask
-        self.switch_terrain(self.stage_settings.terrain_id)
+        self.switch_terrain(self.stage_settings.terrain_id, randomize_rocks=False)
+        self.RM.randomizeInstancers(10)
         if self.enable_stellar_engine:
             self.SE.set_lat_lon(self.stage_settings.coordinates.latitude, self.stage_settings.coordinates.longitude)
             self.update_stellar_engine()
 
     def add_robot_manager(self, robotManager: RobotManager) -> None:
+        """
+        Adds the robot manager to the environment.
+
+        Args:
+            robotManager (RobotManager): The robot manager to be added.
+        """
+
         self.robotManager = robotManager
+        self._has_robots = True
+        self.build_robot_buffers()
+
+    def build_robot_buffers(self) -> None:
+        """
+        Preallocates the buffers used to gather the state of the robots' target links.
+        The buffers are laid out as one contiguous array per quantity, and each rigid group
+        is assigned a fixed slice of them. This avoids growing lists and concatenating arrays
+        every time the terrain is deformed, and allows to run the terramechanics solver once
+        for all the robots.
+        """
+
+        self._rg_slices = []
+        start = 0
+        for rrg in self.robotManager.robots_RG.values():
+            end = start + len(rrg.target_links)
+            self._rg_slices.append((start, end))
+            start = end
+        self._positions_buffer = np.zeros((start, 3), dtype=np.float32)
+        self._orientations_buffer = np.zeros((start, 4), dtype=np.float32)
+        self._forces_buffer = np.zeros((start, 3), dtype=np.float32)
+        self._linear_velocities_buffer = np.zeros((start, 3), dtype=np.float32)
+        self._angular_velocities_buffer = np.zeros((start, 3), dtype=np.float32)
+        self._sinkages_buffer = np.zeros((start,), dtype=np.float32)
 
     def load_DEM(self) -> None:
         """
@@ -175,6 +209,15 @@ class LunaryardController(BaseEnv):
         self.dem = self.T.getDEM()
         self.mask = self.T.getMask()
 
+    def _refresh_terrain(self) -> None:
+        """
+        Loads the DEM and the mask from the TerrainManager and forwards them to the RockManager.
+        The TerrainManager hands out references to its arrays, so no copy is made.
+        """
+
+        self.load_DEM()
+        self.RM.updateImageData(self.dem, self.mask)
+
     # ==============================================================================
     # Stellar engine control
     # ==============================================================================
@@ -322,21 +365,22 @@ class LunaryardController(BaseEnv):
     # Terrain control
     # ==============================================================================
 
-    def switch_terrain(self, flag: int = -1) -> None:
+    def switch_terrain(self, flag: int = -1, randomize_rocks: bool = True) -> None:
         """
         Switches the terrain to a new DEM.
 
         Args:
             flag (int): The id of the DEM to be loaded. If negative, a random DEM is generated.
+            randomize_rocks (bool): True to randomize the rocks on the new terrain, False to leave them untouched.
         """
 
         if flag < 0:
             self.T.randomizeTerrain()
         else:
             self.T.loadTerrainId(flag)
-        self.load_DEM()
-        self.RM.updateImageData(self.dem, self.mask)
-        self.RM.randomizeInstancers(10)
+        self._refresh_terrain()
+        if randomize_rocks:
+            self.RM.randomizeInstancers(10)
 
     def enable_rocks(self, flag: bool = True) -> None:
         """
@@ -356,42 +400,64 @@ class LunaryardController(BaseEnv):
             num (int): The number of rocks to be placed.
         """
 
-        num = int(num)
-        if num == 0:
-            num += 1
-        self.RM.randomizeInstancers(num)
+        self.RM.randomizeInstancers(max(1, int(num)))
 
     def deform_terrain(self) -> None:
         """
         Deforms the terrain.
-        Args:
-            world_poses (np.ndarray): The world poses of the contact points.
-            contact_forces (np.ndarray): The contact forces in local frame reported by rigidprimview.
+        The poses and contact forces of the robots are gathered into preallocated buffers.
+        Each rigid group owns a fixed slice of these buffers, see `build_robot_buffers`.
+        The terrain is not updated if no contact force reaches the deformation engine's force threshold,
+        or if there are no robots in the scene.
         """
-        world_positions = []
-        world_orientations = []
-        contact_forces = []
-        for rrg in self.robotManager.robots_RG.values():
+
+        if not (self._has_robots and self.robotManager.robots_RG):
+            return
+        if len(self.robotManager.robots_RG) != len(self._rg_slices):
+            self.build_robot_buffers()
+        for rrg, (start, end) in zip(self.robotManager.robots_RG.values(), self._rg_slices):
             position, orientation = rrg.get_pose()
-            world_positions.append(position)
-            world_orientations.append(orientation)
-            contact_forces.append(rrg.get_net_contact_forces())
-        world_positions = np.concatenate(world_positions, axis=0)
-        world_orientations = np.concatenate(world_orientations, axis=0)
-        contact_forces = np.concatenate(contact_forces, axis=0)
-
-        self.T.deformTerrain(
-            world_positions,
-            world_orientations,
-            contact_forces,
+            self._positions_buffer[start:end] = position
+            self._orientations_buffer[start:end] = orientation
+            self._forces_buffer[start:end] = rrg.get_net_contact_forces()
+
+        deformed = self.T.deformTerrain(
+            self._positions_buffer,
+            self._orientations_buffer,
+            self._forces_buffer,
         )
-        self.load_DEM()
-        self.RM.updateImageData(self.dem, self.mask)
+        # Only refresh the DEM and the rock sampler if the terrain was modified.
+        if deformed:
+            self._refresh_terrain()
 
     def apply_terramechanics(self) -> None:
-        for rrg in self.robotManager.robots_RG.values():
+        """
+        Applies the terramechanics solver to the robots.
+        The velocities of all the robots are batched such that the solver is called only once.
+        Nothing is done if there are no robots in the scene.
+        """
+
+        if not (self._has_robots and self.robotManager.robots_RG):
+            return
+        if len(self.robotManager.robots_RG) != len(self._rg_slices):
+            self.build_robot_buffers()
+        for rrg, (start, end) in zip(self.robotManager.robots_RG.values(), self._rg_slices):
+            _, orientation = rrg.get_pose()
             linear_velocities, angular_velocities = rrg.get_velocities()
-            sinkages = np.zeros((linear_velocities.shape[0],))
-            force, torque = self.TS.compute_force_and_torque(linear_velocities, angular_velocities, sinkages)
-            rrg.apply_force_torque(force, torque)
-            rrg.apply_force_torque(force, torque)
+            self._orientations_buffer[start:end] = orientation
+            self._linear_velocities_buffer[start:end] = linear_velocities
+            self._angular_velocities_buffer[start:end] = angular_velocities
+
+        # The solver expects the signed forward velocity and spin rate of each wheel, in the wheel's frame.
+        forward_velocities, spin_rates = self.TS.get_wheel_velocities(
+            self._orientations_buffer,
+            self._linear_velocities_buffer,
+            self._angular_velocities_buffer,
+        )
+        force, torque = self.TS.compute_force_and_torque(
+            forward_velocities,
+            spin_rates,
+            self._sinkages_buffer,
+        )
+        for rrg, (start, end) in zip(self.robotManager.robots_RG.values(), self._rg_slices):
+            rrg.apply_force_torque(force[start:end], torque[start:end])
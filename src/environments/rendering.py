@@ -12,6 +12,24 @@ import omni
 
 from src.configurations.rendering_confs import FlaresConf, ChromaticAberrationsConf, MotionBlurConf
 
+_settings = None
+
+
+def _get_settings() -> "carb.settings.ISettings":
+    """
+    Returns the carb settings interface.
+    The interface is acquired on the first call and cached afterwards, as the simulation app
+    must be running before it can be acquired.
+
+    Returns:
+        carb.settings.ISettings: The carb settings interface.
+    """
+
+    global _settings
+    if _settings is None:
+        _settings = carb.settings.get_settings()
+    return _settings
+
 
 # ==============================================================================
 # Renderer Control
@@ -70,14 +88,15 @@ def apply_lens_flare(settings: FlaresConf = None) -> None:
     """
 
     if settings is not None:
-        enable_lens_flare(settings.enable)
-        set_flare_scale(settings.scale)
-        set_flare_num_blades(settings.blades)
-        set_flare_aperture_rotation(settings.aperture_rotation)
-        set_flare_sensor_aspect_ratio(settings.sensor_aspect_ratio)
-        set_flare_sensor_diagonal(settings.sensor_diagonal)
-        set_flare_fstop(settings.fstop)
-        set_flare_focal_length(settings.focal_length)
+        carb_settings = _get_settings()
+        carb_settings.set("/rtx/post/lensFlares/enabled", settings.enable)
+        carb_settings.set("/rtx/post/lensFlares/flareScale", settings.scale)
+        carb_settings.set("/rtx/post/lensFlares/blades", int(settings.blades))
+        carb_settings.set("/rtx/post/lensFlares/apertureRotation", settings.aperture_rotation)
+        carb_settings.set("/rtx/post/lensFlares/sensorAspectRatio", settings.sensor_aspect_ratio)
+        carb_settings.set("/rtx/post/lensFlares/sensorDiagonal", settings.sensor_diagonal)
+        carb_settings.set("/rtx/post/lensFlares/fNumber", settings.fstop)
+        carb_settings.set("/rtx/post/lensFlares/focalLength", settings.focal_length)
 
 
 def enable_lens_flare(enable: bool = True) -> None:
@@ -88,7 +107,7 @@ def enable_lens_flare(enable: bool = True) -> None:
         enable (bool): True to enable the lens flare, False to disable it.
     """
 
-    settings = carb.settings.get_settings()
+    settings = _get_settings()
     settings.set("/rtx/post/lensFlares/enabled", enable)
 
 
@@ -100,7 +119,7 @@ def set_flare_scale(value: float = 0.0) -> None:
         value (float): The scale of the lens flare.
     """
 
-    settings = carb.settings.get_settings()
+    settings = _get_settings()
     settings.set("/rtx/post/lensFlares/flareScale", value)
 
 
@@ -113,7 +132,7 @@ def set_flare_num_blades(value: int = 9) -> None:
         value (int): The number of blades of the lens flare.
     """
 
-    settings = carb.settings.get_settings()
+    settings = _get_settings()
     settings.set("/rtx/post/lensFlares/blades", int(value))
 
 
@@ -125,7 +144,7 @@ def set_flare_aperture_rotation(value: float = 0.0) -> None:
         value (float): The rotation of the lens flare.
     """
 
-    settings = carb.settings.get_settings()
+    settings = _get_settings()
     settings.set("/rtx/post/lensFlares/apertureRotation", value)
 
 
@@ -137,7 +156,7 @@ def set_flare_sensor_diagonal(value: float = 28.0) -> None:
         value (float): The sensor diagonal of the lens flare.
     """
 
-    settings = carb.settings.get_settings()
+    settings = _get_settings()
     settings.set("/rtx/post/lensFlares/sensorDiagonal", value)
 
 
@@ -149,7 +168,7 @@ def set_flare_sensor_aspect_ratio(value: float = 1.5) -> None:
         value (float): The sensor aspect ratio of the lens flare.
     """
 
-    settings = carb.settings.get_settings()
+    settings = _get_settings()
     settings.set("/rtx/post/lensFlares/sensorAspectRatio", value)
 
 
@@ -161,7 +180,7 @@ def set_flare_fstop(value: float = 2.8) -> None:
         value (float): The f-stop of the lens flare.
     """
 
-    settings = carb.settings.get_settings()
+    settings = _get_settings()
     settings.set("/rtx/post/lensFlares/fNumber", value)
 
 
@@ -173,7 +192,7 @@ def set_flare_focal_length(value: float = 12.0):
         value (float): The focal length of the lens flare.
     """
 
-    settings = carb.settings.get_settings()
+    settings = _get_settings()
     settings.set("/rtx/post/lensFlares/focalLength", value)
 
 
@@ -214,7 +233,7 @@ def enable_chromatic_aberrations(enable: bool = True) -> None:
         enable (bool): True to enable the chromatic aberration, False to disable it.
     """
 
-    settings = carb.settings.get_settings()
+    settings = _get_settings()
     settings.set("/rtx/post/chromaticAberration/enabled", enable)
 
 
@@ -226,7 +245,7 @@ def set_chromatic_aberrations_strength(value: Tuple[float, float, float] = (0.0,
         value (Tuple[float,float,float]): The strength of the chromatic aberration.
     """
 
-    settings = carb.settings.get_settings()
+    settings = _get_settings()
     settings.set("/rtx/post/chromaticAberration/strengthR", value[0])
     settings.set("/rtx/post/chromaticAberration/strengthG", value[1])
     settings.set("/rtx/post/chromaticAberration/strengthB", value[2])
@@ -244,7 +263,7 @@ def set_chromatic_aberrations_model(value: Tuple[str, str, str] = ("Radial", "Ra
         if model not in ["Radial", "Barrel"]:
             raise ValueError(f"Invalid chromatic aberration model: {model}")
 
-    settings = carb.settings.get_settings()
+    settings = _get_settings()
     settings.set("/rtx/post/chromaticAberration/modelR", value[0])
     settings.set("/rtx/post/chromaticAberration/modelG", value[1])
     settings.set("/rtx/post/chromaticAberration/modelB", value[2])
@@ -258,7 +277,7 @@ def set_chromatic_aberrations_lanczos(value: bool = False) -> None:
         value (bool): Set to True to enable lanczos, False to disable it.
     """
 
-    settings = carb.settings.get_settings()
+    settings = _get_settings()
     settings.set("/rtx/post/chromaticAberration/enableLanczos", value)
 
 
@@ -300,7 +319,7 @@ def enable_motion_blur(enable: bool = True) -> None:
         enable (bool): True to enable the motion blur, False to disable it.
     """
 
-    settings = carb.settings.get_settings()
+    settings = _get_settings()
     settings.set("/rtx/post/motionblur/enabled", enable)
 
 
@@ -312,7 +331,7 @@ def set_motion_blur_diameter_fraction(value: float = 0.0) -> None:
         value (float): The diameter fraction of the motion blur.
     """
 
-    settings = carb.settings.get_settings()
+    settings = _get_settings()
     settings.set("/rtx/post/motionblur/maxBlurDiameterFraction", value)
 
 
@@ -324,7 +343,7 @@ def set_motion_blur_exposure_fraction(value: float = 0.0) -> None:
         value (float): The exposure fraction of the motion blur.
     """
 
-    settings = carb.settings.get_settings()
+    settings = _get_settings()
     settings.set("/rtx/post/motionblur/exposureFraction", value)
 
 
@@ -336,5 +355,5 @@ def set_motion_blur_num_samples(value: int = 8) -> None:
         value (int): The number of samples of the motion blur.
     """
 
-    settings = carb.settings.get_settings()
+    settings = _get_settings()
     settings.set("/rtx/post/motionblur/numSamples", value)
@@ -10,20 +10,22 @@ from threading import Thread
 
 from omni.isaac.kit import SimulationApp
 from omni.isaac.core import World
-from typing import Union
+from typing import TYPE_CHECKING, Callable, Dict, Union
+import importlib
 import logging
 import omni
 import time
 
-from src.environments_wrappers.ros2.largescale_ros2 import ROS_LargeScaleManager
-from src.environments_wrappers.ros2.lunaryard_ros2 import ROS_LunaryardManager
 from src.environments_wrappers.ros2.robot_manager_ros2 import ROS_RobotManager
-from src.environments_wrappers.ros2.lunalab_ros2 import ROS_LunalabManager
 from src.configurations.procedural_terrain_confs import TerrainManagerConf
 from rclpy.executors import SingleThreadedExecutor as Executor
 from src.physics.physics_scene import PhysicsSceneManager
 import rclpy
 
+if TYPE_CHECKING:
+    # Only imported for type hints: base_wrapper_ros2 imports the Lunaryard controller and its dependencies.
+    from src.environments_wrappers.ros2.base_wrapper_ros2 import ROS_BaseManager
+
 logger = logging.getLogger(__name__)
 logging.basicConfig(format="%(asctime)s %(message)s", datefmt="%m/%d/%Y %I:%M:%S %p")
 
@@ -78,19 +80,20 @@ class Rate:
 
 class ROS2_LabManagerFactory:
     def __init__(self):
-        self._lab_managers = {}
+        self._lab_managers: Dict[str, Union[str, Callable[..., "ROS_BaseManager"]]] = {}
 
     def register(
         self,
         name: str,
-        lab_manager: Union[ROS_LunalabManager, ROS_LunaryardManager],
+        lab_manager: Union[str, Callable[..., "ROS_BaseManager"]],
     ) -> None:
         """
         Registers a lab manager.
 
         Args:
             name (str): Name of the lab manager.
-            lab_manager (Union[ROS_LunalabManager, ROS_LunaryardManager]): Instance of the lab manager.
+            lab_manager (Union[str, Callable[..., ROS_BaseManager]]): Constructor of the lab manager, or its
+                location as a "module:attribute" string. Strings are only imported when the lab manager is requested.
         """
 
         self._lab_managers[name] = lab_manager
@@ -99,7 +102,7 @@ class ROS2_LabManagerFactory:
         self,
         cfg: dict,
         **kwargs,
-    ) -> Union[ROS_LunalabManager, ROS_LunaryardManager]:
+    ) -> "ROS_BaseManager":
         """
         Returns an instance of the lab manager corresponding to the environment name.
 
@@ -107,27 +110,38 @@ class ROS2_LabManagerFactory:
             cfg (dict): Configuration dictionary.
 
         Returns:
-            Union[ROS_LunalabManager, ROS_LunaryardManager]: Instance of the lab manager.
+            ROS_BaseManager: Instance of the lab manager.
+
+        Raises:
+            ValueError: If no lab manager is registered under the environment name.
         """
 
-        return self._lab_managers[cfg["environment"]["name"]](
-            environment_cfg=cfg["environment"],
-            **kwargs,
-        )
+        environment_cfg = cfg["environment"]
+        lab_manager = self._lab_managers.get(environment_cfg["name"])
+        if lab_manager is None:
+            raise ValueError(
+                "Unknown environment: {}. Available environments are: {}".format(
+                    environment_cfg["name"], list(self._lab_managers.keys())
+                )
+            )
+        if isinstance(lab_manager, str):
+            module_name, attribute = lab_manager.split(":")
+            lab_manager = getattr(importlib.import_module(module_name), attribute)
+            self._lab_managers[environment_cfg["name"]] = lab_manager
+        return lab_manager(environment_cfg=environment_cfg, **kwargs)
 
 
 ROS2_LMF = ROS2_LabManagerFactory()
-ROS2_LMF.register("Lunalab", ROS_LunalabManager)
-ROS2_LMF.register("Lunaryard", ROS_LunaryardManager)
-ROS2_LMF.register("LargeScale", ROS_LargeScaleManager)
+ROS2_LMF.register("Lunalab", "src.environments_wrappers.ros2.lunalab_ros2:ROS_LunalabManager")
+ROS2_LMF.register("Lunaryard", "src.environments_wrappers.ros2.lunaryard_ros2:ROS_LunaryardManager")
+ROS2_LMF.register("LargeScale", "src.environments_wrappers.ros2.largescale_ros2:ROS_LargeScaleManager")
 
 
 class ROS2_SimulationManager:
     """
     Manages the simulation. This class is responsible for:
     - Initializing the simulation
-    - Running the lab manager thread
-    - Running the robot manager thread
+    - Running the ROS thread of the lab and robot managers
     - Running the simulation
     - Cleaning the simulation
     """
@@ -164,20 +178,19 @@ class ROS2_SimulationManager:
         else:
             self.rate = Rate(is_disabled=True)
 
-        # Lab manager thread
+        # Lab manager
         self.ROSLabManager = ROS2_LMF(
             cfg, is_simulation_alive=self.simulation_app.is_running, close_simulation=self.simulation_app.close
         )
-        self.exec1 = Executor()
-        self.exec1.add_node(self.ROSLabManager)
-        self.exec1_thread = Thread(target=self.exec1.spin, daemon=True, args=())
-        self.exec1_thread.start()
-        # Robot manager thread
+        # Robot manager
         self.ROSRobotManager = ROS_RobotManager(cfg["environment"]["robots_settings"])
-        self.exec2 = Executor()
-        self.exec2.add_node(self.ROSRobotManager)
-        self.exec2_thread = Thread(target=self.exec2.spin, daemon=True, args=())
-        self.exec2_thread.start()
+        # Both nodes share a single executor spun on a single thread.
+        # This limits the number of threads contending for the GIL with the simulation loop.
+        self.exec = Executor()
+        self.exec.add_node(self.ROSLabManager)
+        self.exec.add_node(self.ROSRobotManager)
+        self.exec_thread = Thread(target=self.exec.spin, daemon=True, args=())
+        self.exec_thread.start()
 
         if self.ROSLabManager.get_wait_for_threads():
             self.simulation_app.add_wait(self.ROSLabManager.get_wait_for_threads())
@@ -210,16 +223,22 @@ class ROS2_SimulationManager:
         Runs the simulation.
         """
 
+        # Resolve the loop invariants once.
+        is_playing = self.world.is_playing
+        physics_dt = self.world.get_physics_dt()
+
         self.timeline.play()
         while self.simulation_app.is_running():
             self.rate.reset()
             self.world.step(render=True)
-            if self.world.is_playing():
+            if is_playing():
                 # Apply modifications to the lab only once the simulation step is finished
                 # This is extremely important as modifying the stage during a simulation step
                 # will lead to a crash.
-                self.ROSLabManager.periodic_update(dt=self.world.get_physics_dt())
-                if self.world.current_time_step_index == 0:
+                self.ROSLabManager.periodic_update(dt=physics_dt)
+                # Read once per step. It goes back to 0 whenever the timeline is stopped and played again.
+                step_index = self.world.current_time_step_index
+                if step_index == 0:
                     self.world.reset()
                     self.ROSLabManager.reset()
                     self.ROSRobotManager.reset()
@@ -229,19 +248,17 @@ class ROS2_SimulationManager:
                     self.ROSLabManager.trigger_reset = False
                 self.ROSRobotManager.apply_modifications()
                 if self.enable_deformation:
-                    if self.world.current_time_step_index >= (self.deform_delay * self.world.get_physics_dt()):
+                    if step_index >= (self.deform_delay * physics_dt):
                         self.ROSLabManager.LC.deform_terrain()
                         # self.ROSLabManager.LC.applyTerramechanics()
             if not self.ROSLabManager.monitor_thread_is_alive():
                 logger.debug("Destroying the ROS nodes")
                 self.ROSLabManager.destroy_node()
                 self.ROSRobotManager.destroy_node()
-                logger.debug("Shutting down the ROS executors")
-                self.exec1.shutdown()
-                self.exec2.shutdown()
-                logger.debug("Joining the ROS threads")
-                self.exec1_thread.join()
-                self.exec2_thread.join()
+                logger.debug("Shutting down the ROS executor")
+                self.exec.shutdown()
+                logger.debug("Joining the ROS thread")
+                self.exec_thread.join()
                 logger.debug("Shutting down ROS2")
                 rclpy.shutdown()
                 break
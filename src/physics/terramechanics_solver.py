@@ -6,11 +6,13 @@ __maintainer__ = "Antoine Richard"
 __email__ = "antoine.richard@uni.lu"
 __status__ = "development"
 
+from typing import Tuple
 import numpy as np
 import torch
 import scipy.integrate as integ
 
 from src.physics.terramechanics_parameters import RobotParameter, TerrainMechanicalParameter
+from src.physics.terramechanics_solver_numba import _compute_force_and_torque, _get_quadrature
 
 
 class TerramechanicsSolver:
@@ -28,6 +30,33 @@ class TerramechanicsSolver:
         self.robot_param = robot_param
         self.terrain_param = terrain_param
         self.num_wheels = robot_param.num_wheels
+        self._nodes, self._weights = _get_quadrature()
+        self._force_out = np.zeros((self.num_wheels, 3), dtype=np.float64)
+        self._torque_out = np.zeros((self.num_wheels, 3), dtype=np.float64)
+
+    @staticmethod
+    def get_wheel_velocities(
+        orientations: np.ndarray, linear_velocities: np.ndarray, angular_velocities: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Computes the signed forward velocity and spin rate of the wheels from their world frame velocities.
+        The spin axis of a wheel is the y axis of its frame. The forward direction is the horizontal direction
+        orthogonal to the spin axis, (axis x up). The x axis of the wheel frame is not used, as it rotates with
+        the wheel. The lateral and vertical velocities, and the yaw rate of the chassis, are discarded.
+        Args:
+            orientations (np.ndarray): The orientation of the wheels in the world frame (w, x, y, z) (num_wheels, 4).
+            linear_velocities (np.ndarray): The linear velocity of the wheels in the world frame (num_wheels, 3).
+            angular_velocities (np.ndarray): The angular velocity of the wheels in the world frame (num_wheels, 3).
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The forward velocity (num_wheels, ) and the spin rate (num_wheels, )."""
+        w, x, y, z = orientations[:, 0], orientations[:, 1], orientations[:, 2], orientations[:, 3]
+        # Second column of the rotation matrix: the spin axis in the world frame.
+        axis = np.stack((2 * (x * y - w * z), 1 - 2 * (x * x + z * z), 2 * (y * z + w * x)), axis=1)
+        spin_rate = np.sum(axis * angular_velocities, axis=1)
+        # axis x up = (axis_y, -axis_x, 0), normalized. It vanishes if the spin axis is vertical.
+        norm = np.maximum(np.hypot(axis[:, 0], axis[:, 1]), 1e-6)
+        forward_velocity = (axis[:, 1] * linear_velocities[:, 0] - axis[:, 0] * linear_velocities[:, 1]) / norm
+        return forward_velocity, spin_rate
 
     ## Eventually, input to this solver is sinkage z and velocity, and angular velocity
     def compute_slip_ratio(self, v: float, omega: float) -> np.ndarray:
@@ -203,27 +232,38 @@ class TerramechanicsSolver:
     def compute_force_and_torque(self, velocity: np.ndarray, omega: np.ndarray, sinkage: np.ndarray) -> np.ndarray:
         """
         Computes the force and torque.
+        The wheels of several robots can be stacked along the first axis to solve them in a single call.
+        The wheels are solved in parallel by a Numba kernel, and the results are written to preallocated
+        buffers. The returned arrays are overwritten by the next call.
         Args:
             velocity (np.ndarray): The forward velocity (vx) of the robot (num_wheels, ).
             omega (np.ndarray): The angular velocity of the robot (num_wheels, ).
             sinkage (np.ndarray): The sinkage of the robot (num_wheels, )."""
-        forces = np.zeros((self.num_wheels, 3))
-        torques = np.zeros((self.num_wheels, 3))
-        for i in range(self.num_wheels):
-            self.compute_slip_ratio(velocity[i], omega[i])
-            self.compute_thetas(sinkage[i])
-            self.compute_sigma_max()
-            fx = self.compute_fx()
-            fy = 0
-            fz = self.compute_fz()
-            my = self.compute_my()
-            forces[i, 0] = fx
-            forces[i, 1] = fy
-            forces[i, 2] = fz
-            torques[i, 0] = 0
-            torques[i, 1] = my
-            torques[i, 2] = 0
-        return forces, torques
+        num_wheels = velocity.shape[0]
+        if self._force_out.shape[0] != num_wheels:
+            self._force_out = np.zeros((num_wheels, 3), dtype=np.float64)
+            self._torque_out = np.zeros((num_wheels, 3), dtype=np.float64)
+        _compute_force_and_torque(
+            np.ascontiguousarray(velocity, dtype=np.float64),
+            np.ascontiguousarray(omega, dtype=np.float64),
+            np.ascontiguousarray(sinkage, dtype=np.float64),
+            self.robot_param.wheel_radius,
+            self.robot_param.wheel_base,
+            self.terrain_param.c,
+            self.terrain_param.k_c,
+            self.terrain_param.k_phi,
+            self.terrain_param.n,
+            self.terrain_param.a_0,
+            self.terrain_param.a_1,
+            self.terrain_param.phi,
+            self.terrain_param.K,
+            self.terrain_param.rho,
+            self._nodes,
+            self._weights,
+            self._force_out,
+            self._torque_out,
+        )
+        return self._force_out, self._torque_out
 
     # def compute_force_and_torque(self)->np.ndarray:
     #     """
@@ -0,0 +1,143 @@
+__author__ = "Junnosuke Kamohara, Antoine Richard"
+__copyright__ = "Copyright 2023-24, Space Robotics Lab, SnT, University of Luxembourg, SpaceR"
+__license__ = "BSD 3-Clause"
+__version__ = "2.0.0"
+__maintainer__ = "Antoine Richard"
+__email__ = "antoine.richard@uni.lu"
+__status__ = "development"
+
+from typing import Tuple
+import numba as nb
+import numpy as np
+
+# Below this velocity (m/s), the wheel is considered at rest and the slip ratio is zero.
+SLIP_EPSILON = 1e-6
+
+
+def _get_quadrature(order: int = 32) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the nodes and weights of a Gauss-Legendre quadrature on [-1, 1].
+    They are used to integrate the stress distributions under the wheel with a fixed number
+    of samples, which is what allows the solver to be compiled by Numba.
+
+    Args:
+        order (int): number of nodes of the quadrature.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: nodes and weights of the quadrature.
+    """
+
+    nodes, weights = np.polynomial.legendre.leggauss(order)
+    return nodes.astype(np.float64), weights.astype(np.float64)
+
+
+@nb.njit(parallel=True, fastmath=True, cache=True, error_model="numpy")
+def _compute_force_and_torque(
+    velocity: np.ndarray,
+    omega: np.ndarray,
+    sinkage: np.ndarray,
+    wheel_radius: float,
+    wheel_base: float,
+    c: float,
+    k_c: float,
+    k_phi: float,
+    n: float,
+    a_0: float,
+    a_1: float,
+    phi: float,
+    K: float,
+    rho: float,
+    nodes: np.ndarray,
+    weights: np.ndarray,
+    forces: np.ndarray,
+    torques: np.ndarray,
+) -> None:
+    """
+    Computes the force and torque acting on every wheel. The wheels are solved in parallel.
+    The normal and shear stresses are integrated over the rear region [theta_r, theta_m]
+    and the front region [theta_m, theta_f] of the contact patch using a Gauss-Legendre quadrature.
+
+    Args:
+        velocity (np.ndarray): forward velocity of the wheels (num_wheels, ).
+        omega (np.ndarray): angular velocity of the wheels (num_wheels, ).
+        sinkage (np.ndarray): sinkage of the wheels (num_wheels, ).
+        wheel_radius (float): radius of the wheels.
+        wheel_base (float): width of the wheels.
+        c (float): cohesion of the terrain.
+        k_c (float): cohesive modulus of the terrain.
+        k_phi (float): frictional modulus of the terrain.
+        n (float): sinkage exponent of the terrain.
+        a_0 (float): first coefficient of the maximum stress angle.
+        a_1 (float): second coefficient of the maximum stress angle.
+        phi (float): internal friction angle of the terrain.
+        K (float): shear deformation modulus of the terrain.
+        rho (float): density of the terrain.
+        nodes (np.ndarray): nodes of the quadrature on [-1, 1].
+        weights (np.ndarray): weights of the quadrature on [-1, 1].
+        forces (np.ndarray): output forces (num_wheels, 3). (Fx, Fy, Fz)
+        torques (np.ndarray): output torques (num_wheels, 3). (Mx, My, Mz)
+    """
+
+    tan_phi = np.tan(phi)
+    sigma_max = (c * k_c + rho * 9.81 * wheel_base * k_phi) * (wheel_radius / wheel_base) ** n
+    for i in nb.prange(velocity.shape[0]):
+        # Slip ratio. It is undefined when the wheel is at rest (0 / 0), it is then set to zero.
+        # The denominators are kept away from zero, and the ratio is clipped to [-1, 1], which is
+        # its range whenever the velocities are not of opposite signs.
+        v = velocity[i]
+        w = omega[i] * wheel_radius
+        if max(abs(v), abs(w)) < SLIP_EPSILON:
+            slip = 0.0
+        elif v <= w:
+            slip = 1.0 - v / np.copysign(max(abs(w), SLIP_EPSILON), w)
+        else:
+            slip = w / np.copysign(max(abs(v), SLIP_EPSILON), v) - 1.0
+        slip = min(max(slip, -1.0), 1.0)
+        # Contact angles
+        theta_f = np.arctan(1.0 - sinkage[i] / wheel_radius)
+        theta_r = 0.0
+        theta_m = (a_0 + a_1 * slip) * theta_f
+        cos_f = np.cos(theta_f)
+        sin_f = np.sin(theta_f)
+
+        fx = 0.0
+        fz = 0.0
+        my = 0.0
+        # Rear region: [theta_r, theta_m]
+        half = 0.5 * (theta_m - theta_r)
+        mid = 0.5 * (theta_m + theta_r)
+        if half != 0.0:
+            for k in range(nodes.shape[0]):
+                theta = half * nodes[k] + mid
+                cos_t = np.cos(theta)
+                sin_t = np.sin(theta)
+                sigma = sigma_max * (
+                    np.cos(theta_f - ((theta - theta_r) / (theta_m - theta_r)) * (theta_f - theta_m)) - cos_f
+                )
+                j = wheel_radius * (theta_f - theta - (1.0 - slip) * (sin_f - sin_t))
+                tau = (c + sigma * tan_phi) * (1.0 - np.exp(-j / K))
+                wk = half * weights[k]
+                fx += wk * (tau * cos_t - sigma * sin_t)
+                fz += wk * (tau * sin_t - sigma * cos_t)
+                my += wk * tau
+        # Front region: [theta_m, theta_f]
+        half = 0.5 * (theta_f - theta_m)
+        mid = 0.5 * (theta_f + theta_m)
+        for k in range(nodes.shape[0]):
+            theta = half * nodes[k] + mid
+            cos_t = np.cos(theta)
+            sin_t = np.sin(theta)
+            sigma = sigma_max * (cos_t - cos_f)
+            j = wheel_radius * (theta_f - theta - (1.0 - slip) * (sin_f - sin_t))
+            tau = (c + sigma * tan_phi) * (1.0 - np.exp(-j / K))
+            wk = half * weights[k]
+            fx += wk * (tau * cos_t - sigma * sin_t)
+            fz += wk * (tau * sin_t - sigma * cos_t)
+            my += wk * tau
+
+        forces[i, 0] = wheel_radius * wheel_base * fx
+        forces[i, 1] = 0.0
+        forces[i, 2] = wheel_radius * wheel_base * fz
+        torques[i, 0] = 0.0
+        torques[i, 1] = wheel_radius * wheel_radius * wheel_base * my
+        torques[i, 2] = 0.0
@@ -645,20 +645,21 @@ class DeformationEngine:
             world_positions (np.ndarray): world position of robot's links (n, 3)
             world_orientations (np.ndarray): world orientation of robot's links (n, 4)
         ====
-        n is the number of links.
+        n is the number of links. It can be lower than num_links if some links are not deforming the terrain.
         num_points = n * num_point_sample
         """
-        self.headings[:, 0] = 2.0 * (world_orientations[:, 0] * world_orientations[:, 3])
-        self.headings[:, 1] = 1.0 - 2.0 * (world_orientations[:, 3] * world_orientations[:, 3])
+        headings = self.headings[: world_positions.shape[0]]
+        headings[:, 0] = 2.0 * (world_orientations[:, 0] * world_orientations[:, 3])
+        headings[:, 1] = 1.0 - 2.0 * (world_orientations[:, 3] * world_orientations[:, 3])
         projection_points = np.zeros((world_positions.shape[0], self.profile.shape[0], 2))
         projection_points[:, :, 0] = (
-            self.profile[:, 0] * self.headings[:, 1, None]
-            - self.profile[:, 1] * self.headings[:, 0, None]
+            self.profile[:, 0] * headings[:, 1, None]
+            - self.profile[:, 1] * headings[:, 0, None]
             + world_positions[:, 0][:, None]
         )
         projection_points[:, :, 1] = (
-            self.profile[:, 0] * self.headings[:, 0, None]
-            + self.profile[:, 1] * self.headings[:, 1, None]
+            self.profile[:, 0] * headings[:, 0, None]
+            + self.profile[:, 1] * headings[:, 1, None]
             + world_positions[:, 1][:, None]
         )
         self.profile_global = projection_points.reshape(-1, 2)
@@ -15,15 +15,17 @@ import os
 
 from src.terrain_management.large_scale_terrain.geometry_clipmaps_numba import (
     _build_mesh,
+    _get_values_2x2,
+    _get_values_4x4,
 )
 from src.terrain_management.large_scale_terrain.geometry_clipmaps_warp import (
     _preprocess,
     _bilinear_interpolation,
     _bicubic_interpolation,
     _get_values_wp_2x2,
-    _get_values_wp_4x4,
     _preprocess_multi_points,
     _bilinear_interpolation_and_random_orientation,
+    _create_sampling_kernel,
 )
 from src.terrain_management.large_scale_terrain.utils import ScopedTimer
 
@@ -74,13 +76,23 @@ class GeoClipmap:
         specs: GeometryClipmapConf,
         interpolation_method: str = "bilinear",
         acceleration_mode: str = "hybrid",
+        dem_precision: str = "float32",
+        transpose_dem: bool = True,
+        use_cuda_graph: bool = True,
         profiling: bool = False,
     ) -> None:
         """
+        The options of the DEM sampler are not part of the specifications, as these are hashed
+        to identify the mesh backbone, which does not depend on them.
+
         Args:
             specs (GeometryClipmapConf): specifications for the clipmap.
             interpolation_method (str): method to use for interpolation.
             acceleration_mode (str): mode to use for acceleration.
+            dem_precision (str): precision used to store the DEM on the GPU. Only used in "gpu" mode.
+            transpose_dem (bool): flag to store the DEM transposed on the GPU. Only used in "gpu" mode.
+            use_cuda_graph (bool): flag to replay the sampling from a CUDA graph. Only used in "gpu" mode.
+            profiling (bool): flag to enable profiling.
         """
 
         self.specs = specs
@@ -94,6 +106,9 @@ class GeoClipmap:
         self.dem_shape = None
         self.interpolation_method = interpolation_method
         self.acceleration_mode = acceleration_mode
+        self.dem_precision = dem_precision
+        self.transpose_dem = transpose_dem
+        self.use_cuda_graph = use_cuda_graph
         self.profiling = profiling
         self.initMesh()
 
@@ -117,6 +132,9 @@ class GeoClipmap:
             interpolation_method=self.interpolation_method,
             acceleration_mode=self.acceleration_mode,
             profiling=self.profiling,
+            transpose_dem=self.transpose_dem,
+            use_cuda_graph=self.use_cuda_graph,
+            dem_precision=self.dem_precision,
         )
 
     @staticmethod
@@ -210,6 +228,22 @@ class GeoClipmap:
         """
         self.DEM_sampler.get_elevation(coordinates)
 
+    def enqueue_elevation(self, coordinates: Tuple[float, float]) -> None:
+        """
+        Start updating the elevation of the mesh backbone at the given coordinates.
+        fetch_elevation must be called before the points of the mesh backbone are used.
+
+        Args:
+            coordinates (Tuple[float, float]): coordinates to update from (in meters).
+        """
+        self.DEM_sampler.enqueue_elevation(coordinates)
+
+    def fetch_elevation(self) -> None:
+        """
+        Wait for the elevation requested by enqueue_elevation and write it to the mesh backbone.
+        """
+        self.DEM_sampler.fetch_elevation()
+
     def get_height_and_random_orientation(
         self, x: np.ndarray, y: np.ndarray, coords: Tuple[float, float], seed: int = 0
     ) -> Tuple[np.ndarray, np.ndarray]:
@@ -228,7 +262,16 @@ class DEMSampler:
     amount of memory. The "hybrid" mode is slower, but it can be used on GPUs with less
     memory as the DEM is stored on the system memory. Ideally, we should work with a compressed
     DEM stored in GPU memory to reduce the memory footprint and accelerate the operations.
+    In "hybrid" mode, the points are querried from the DEM by parallel Numba kernels.
     The interpolation method can be either "bilinear" or "bicubic".
+    In "gpu" mode, the DEM can be stored transposed (column-major). The points of the mesh
+    backbone are laid out such that x varies the fastest, so consecutive threads then read
+    contiguous memory.
+    In "gpu" mode, the sampling can also be recorded in a CUDA graph on the first call and
+    replayed on the following ones. This removes the host overhead of the launch and of the copies.
+    In "gpu" mode, the DEM can also be stored as 16 bits fixed-point values. This halves the memory
+    footprint of the DEM and the amount of data read by the gathers, at the cost of quantizing the
+    elevation over the range of the DEM.
     """
 
     def __init__(
@@ -241,6 +284,9 @@ class DEMSampler:
         interpolation_method: str = "bilinear",
         acceleration_mode: str = "hybrid",
         profiling: bool = False,
+        transpose_dem: bool = True,
+        use_cuda_graph: bool = True,
+        dem_precision: str = "float32",
     ) -> None:
         """
         Args:
@@ -252,6 +298,10 @@ class DEMSampler:
                 or "bicubic".
             acceleration_mode (str): mode to use for acceleration. Can be "hybrid" or "gpu".
             profiling (bool): flag to enable profiling.
+            transpose_dem (bool): flag to store the DEM transposed on the GPU. Only used in "gpu" mode.
+            use_cuda_graph (bool): flag to replay the sampling from a CUDA graph. Only used in "gpu" mode.
+            dem_precision (str): precision used to store the DEM on the GPU. Can be "float32" or "int16".
+                Only used in "gpu" mode.
         """
 
         self.dem = dem  # Reference (read only)
@@ -260,6 +310,12 @@ class DEMSampler:
         self.specs = specs  # Reference (read only)
         self.points = points  # Reference (read only)
         self.profiling = profiling
+        self.inv_mpp = 1.0 / self.specs.source_resolution
+        self.transpose_dem = transpose_dem and (acceleration_mode == "gpu")
+        self.use_cuda_graph = use_cuda_graph and (acceleration_mode == "gpu")
+        if dem_precision not in ["float32", "int16"]:
+            raise ValueError("Invalid DEM precision")
+        self.dem_precision = dem_precision if (acceleration_mode == "gpu") else "float32"
 
         self.interpolation_method = interpolation_method
         self.acceleration_mode = acceleration_mode
@@ -270,6 +326,13 @@ class DEMSampler:
         Initialize the buffers used by Warp to accelerate the operations.
         """
 
+        # Recorded after the copies to the host, waiting on it only blocks until the work of this
+        # sampler completes instead of synchronizing the whole device.
+        self.copy_event = wp.Event(device="cuda")
+        # Host, float32 and row-major view of the DEM, used by bilinear_interpolation_and_normal_CPU in both
+        # modes. In "gpu" mode, dem_wp is on the device, and can be transposed or quantized.
+        self.dem_host_wp = wp.array(self.dem, dtype=float, device="cpu", copy=False)
+        self.dem_host_strides_wp = wp.vec2i(self.dem_size[1], 1)
         if self.acceleration_mode == "hybrid":
             self.initialize_warp_buffers_hybrid_mode()
         elif self.acceleration_mode == "gpu":
@@ -287,29 +350,64 @@ class DEMSampler:
 
         if self.acceleration_mode == "gpu":
             with wp.ScopedTimer("update DEM data", active=self.profiling):
-                self.dem_wp.assign(self.dem.flatten())
+                dem, dem_scale = self.get_device_DEM()
+                self.dem_wp.assign(dem)
+                self.dem_scale_wp.assign(np.array([dem_scale], dtype=np.float32))
+
+    def get_flat_DEM(self) -> np.ndarray:
+        """
+        Returns the DEM flattened in the memory layout used on the GPU.
+
+        Returns:
+            np.ndarray: flattened DEM, transposed if transpose_dem is set.
+        """
+
+        if self.transpose_dem:
+            return self.dem.T.flatten()
+        else:
+            return self.dem.flatten()
+
+    def get_device_DEM(self) -> Tuple[np.ndarray, Tuple[float, float]]:
+        """
+        Returns the DEM in the memory layout and precision used on the GPU.
+        In "int16" precision, the DEM is quantized over its range of elevations. The elevation
+        is recovered as z = value * scale + offset, with an error of at most half the scale.
+
+        Returns:
+            Tuple[np.ndarray, Tuple[float, float]]: flattened DEM, and the scale and offset of its values.
+        """
+
+        dem = self.get_flat_DEM()
+        if self.dem_precision == "float32":
+            return dem, (1.0, 0.0)
+        z_min = float(dem.min())
+        z_max = float(dem.max())
+        offset = 0.5 * (z_min + z_max)
+        scale = (z_max - z_min) / 65534.0 or 1.0
+        dem = np.clip(np.rint((dem - offset) / scale), -32767, 32767).astype(np.int16)
+        return dem, (scale, offset)
 
     def initialize_warp_buffers_hybrid_mode(self) -> None:
         """
         Initialize the buffers used by Warp to accelerate the operations in the "hybrid" mode.
         """
 
-        self.dem_wp = wp.array(
-            self.dem,
-            dtype=float,
-            device="cpu",
-            copy=False,
-        )
-        self.points_wp = wp.array(self.points[:, :2], dtype=wp.vec2f, device="cuda")
+        self.dem_wp = self.dem_host_wp
+        # The x and y coordinates are stored in separate arrays to get coalesced loads.
+        self.points_x_wp = wp.array(np.ascontiguousarray(self.points[:, 0]), dtype=float, device="cuda")
+        self.points_y_wp = wp.array(np.ascontiguousarray(self.points[:, 1]), dtype=float, device="cuda")
         self.x_wp = wp.zeros((self.points.shape[0]), dtype=float, device="cuda")
         self.y_wp = wp.zeros((self.points.shape[0]), dtype=float, device="cuda")
         self.x_wp_cpu = wp.zeros((self.points.shape[0]), dtype=float, device="cpu", pinned=True)
         self.y_wp_cpu = wp.zeros((self.points.shape[0]), dtype=float, device="cpu", pinned=True)
+        # Views on the pinned buffers, used by the Numba kernels.
+        self.x_np = self.x_wp_cpu.numpy()
+        self.y_np = self.y_wp_cpu.numpy()
         self.x_delta = wp.zeros((self.points.shape[0]), dtype=float, device="cuda")
         self.y_delta = wp.zeros((self.points.shape[0]), dtype=float, device="cuda")
         self.dem_shape_wp = wp.vec2i(self.dem_size[0], self.dem_size[1])
+        self.dem_strides_wp = wp.vec2i(self.dem_size[1], 1)
         self.dem_shape_wp_f = wp.vec2f(self.dem_size[0], self.dem_size[1])
-        self.coeffs_wp = wp.zeros(self.points.shape[0], dtype=wp.vec4f, device="cuda")
         self.z_cuda = wp.zeros(self.points.shape[0], dtype=float, device="cuda")
 
         if self.interpolation_method == "bilinear":
@@ -320,29 +418,44 @@ class DEMSampler:
             self.q_cuda = wp.zeros((self.points.shape[0]), dtype=wp.mat44f, device="cuda")
         else:
             raise ValueError("Invalid interpolation method")
+        self.q_np = self.q_cpu.numpy()
 
     def initialize_warp_buffers_gpu_mode(self) -> None:
         """
         Initialize the buffers used by Warp to accelerate the operations in the "gpu" mode.
         """
 
-        self.dem_wp = wp.array(self.dem.flatten(), dtype=float, device="cuda")
-        self.points_wp = wp.array(self.points[:, :2], dtype=wp.vec2f, device="cuda")
-        self.x_wp = wp.zeros((self.points.shape[0]), dtype=float, device="cuda")
-        self.y_wp = wp.zeros((self.points.shape[0]), dtype=float, device="cuda")
-        self.x_delta = wp.zeros((self.points.shape[0]), dtype=float, device="cuda")
-        self.y_delta = wp.zeros((self.points.shape[0]), dtype=float, device="cuda")
+        dem, dem_scale = self.get_device_DEM()
+        dem_dtype = wp.int16 if self.dem_precision == "int16" else float
+        self.dem_wp = wp.array(dem, dtype=dem_dtype, device="cuda")
+        # Kept on the device so that a DEM update does not invalidate the CUDA graph.
+        self.dem_scale_wp = wp.array(np.array([dem_scale], dtype=np.float32), dtype=wp.vec2f, device="cuda")
+        # The x and y coordinates are stored in separate arrays to get coalesced loads.
+        self.points_x_wp = wp.array(np.ascontiguousarray(self.points[:, 0]), dtype=float, device="cuda")
+        self.points_y_wp = wp.array(np.ascontiguousarray(self.points[:, 1]), dtype=float, device="cuda")
         self.dem_shape_wp = wp.vec2i(self.dem_size[0], self.dem_size[1])
-        self.dem_shape_wp_f = wp.vec2f(self.dem_size[0], self.dem_size[1])
-        self.coeffs_wp = wp.zeros(self.points.shape[0], dtype=wp.vec4f, device="cuda")
-        self.z_cuda = wp.zeros(self.points.shape[0], dtype=float, device="cuda")
-
-        if self.interpolation_method == "bilinear":
-            self.q_cuda = wp.zeros((self.points.shape[0]), dtype=wp.mat22f, device="cuda")
-        elif self.interpolation_method == "bicubic":
-            self.q_cuda = wp.zeros((self.points.shape[0]), dtype=wp.mat44f, device="cuda")
+        if self.transpose_dem:
+            dem_strides = (1, self.dem_size[0])
         else:
-            raise ValueError("Invalid interpolation method")
+            dem_strides = (self.dem_size[1], 1)
+        self.dem_strides_wp = wp.vec2i(dem_strides[0], dem_strides[1])
+        # The offset and the elevation go through fixed, pinned buffers such that the
+        # copies can be recorded in the CUDA graph alongside the kernel.
+        self.coords_cpu = wp.zeros(1, dtype=wp.vec2f, device="cpu", pinned=True)
+        self.coords_wp = wp.zeros(1, dtype=wp.vec2f, device="cuda")
+        self.z_cuda = wp.zeros(self.points.shape[0], dtype=float, device="cuda")
+        self.z_cpu = wp.zeros(self.points.shape[0], dtype=float, device="cpu", pinned=True)
+
+        # The DEM is sampled by a single fused kernel, no intermediate buffers are needed.
+        # The kernel is specialized for the shape and layout of the DEM.
+        self.sampling_kernel = _create_sampling_kernel(
+            self.interpolation_method,
+            (int(self.dem_size[0]), int(self.dem_size[1])),
+            dem_strides,
+            dem_dtype=dem_dtype,
+        )
+        # Recorded on the first call, see sample_GPU.
+        self.sampling_graph = None
 
     def get_elevation(self, position: np.ndarray) -> None:
         """
@@ -352,6 +465,20 @@ class DEMSampler:
             position (np.ndarray): position to query the elevation from (in meters).
         """
 
+        self.enqueue_elevation(position)
+        self.fetch_elevation()
+
+    def enqueue_elevation(self, position: np.ndarray) -> None:
+        """
+        Start computing the elevation of the mesh backbone at the given position.
+        In "gpu" mode, the work is only enqueued on the GPU, such that the host can do something
+        else while it runs. fetch_elevation must then be called to write it to the mesh backbone.
+        In "hybrid" mode, the CPU takes part in the computation, so the elevation is updated right away.
+
+        Args:
+            position (np.ndarray): position to query the elevation from (in meters).
+        """
+
         if self.acceleration_mode == "hybrid":
             self.get_elevation_hybrid(position)
         elif self.acceleration_mode == "gpu":
@@ -368,7 +495,7 @@ class DEMSampler:
         """
 
         with wp.ScopedTimer("preprocess_Hybrid", active=self.profiling):
-            position_in_pixel = position * (1.0 / self.specs.source_resolution)
+            position_in_pixel = position * self.inv_mpp
             coords = wp.vec2f(position_in_pixel[0], position_in_pixel[1])
             wp.launch(
                 kernel=_preprocess,
@@ -376,16 +503,18 @@ class DEMSampler:
                 inputs=[
                     self.x_wp,
                     self.y_wp,
-                    self.points_wp,
+                    self.points_x_wp,
+                    self.points_y_wp,
                     coords,
-                    self.specs.source_resolution,
+                    self.inv_mpp,
                     self.dem_shape_wp_f,
                 ],
                 device="cuda",
             )
             self.x_wp_cpu.assign(self.x_wp)
             self.y_wp_cpu.assign(self.y_wp)
-            wp.synchronize()
+            wp.record_event(self.copy_event)
+            wp.synchronize_event(self.copy_event)
         if self.interpolation_method == "bilinear":
             self.bilinear_interpolation_hybrid()
         elif self.interpolation_method == "bicubic":
@@ -399,18 +528,7 @@ class DEMSampler:
         """
 
         with wp.ScopedTimer("get_values_wp_Hybrid", active=self.profiling):
-            wp.launch(
-                kernel=_get_values_wp_2x2,
-                dim=self.points.shape[0],
-                inputs=[
-                    self.dem_wp.flatten(),
-                    self.dem_shape_wp,
-                    self.x_wp_cpu,
-                    self.y_wp_cpu,
-                    self.q_cpu,
-                ],
-                device="cpu",
-            )
+            _get_values_2x2(self.dem, self.x_np, self.y_np, self.q_np)
             self.q_cuda.assign(self.q_cpu)
 
         with wp.ScopedTimer("bilinear_interpolation_Hybrid", active=self.profiling):
@@ -432,18 +550,7 @@ class DEMSampler:
         """
 
         with wp.ScopedTimer("get_values_wp_4x4_Hybrid", active=self.profiling):
-            wp.launch(
-                kernel=_get_values_wp_4x4,
-                dim=self.points.shape[0],
-                inputs=[
-                    self.dem_wp.flatten(),
-                    self.dem_shape_wp,
-                    self.x_wp_cpu,
-                    self.y_wp_cpu,
-                    self.q_cpu,
-                ],
-                device="cpu",
-            )
+            _get_values_4x4(self.dem, self.x_np, self.y_np, self.q_np)
             self.q_cuda.assign(self.q_cpu)
 
         with wp.ScopedTimer("bicubic_interpolation_Hybrid", active=self.profiling):
@@ -454,7 +561,6 @@ class DEMSampler:
                     self.x_wp,
                     self.y_wp,
                     self.q_cuda,
-                    self.coeffs_wp,
                     self.z_cuda,
                 ],
             )
@@ -468,22 +574,8 @@ class DEMSampler:
             position (np.ndarray): position to query the elevation from (in meters).
         """
 
-        with wp.ScopedTimer("preprocess_GPU", active=self.profiling):
-            position_in_pixel = position * (1.0 / self.specs.source_resolution)
-            coords = wp.vec2f(position_in_pixel[0], position_in_pixel[1])
-            wp.launch(
-                kernel=_preprocess,
-                dim=self.points.shape[0],
-                inputs=[
-                    self.x_wp,
-                    self.y_wp,
-                    self.points_wp,
-                    coords,
-                    self.specs.source_resolution,
-                    self.dem_shape_wp_f,
-                ],
-                device="cuda",
-            )
+        position_in_pixel = position * self.inv_mpp
+        self.coords_cpu.numpy()[0] = (position_in_pixel[0], position_in_pixel[1])
         if self.interpolation_method == "bilinear":
             self.bilinear_interpolation_GPU()
         elif self.interpolation_method == "bicubic":
@@ -496,67 +588,70 @@ class DEMSampler:
         Perform bilinear interpolation using the "gpu" mode.
         """
 
-        with wp.ScopedTimer("get_values_wp_GPU", active=self.profiling):
-            wp.launch(
-                kernel=_get_values_wp_2x2,
-                dim=self.points.shape[0],
-                inputs=[
-                    self.dem_wp,
-                    self.dem_shape_wp,
-                    self.x_wp,
-                    self.y_wp,
-                    self.q_cuda,
-                ],
-                device="cuda",
-            )
-
-        with wp.ScopedTimer("bilinear_interpolation_GPU", active=self.profiling):
-            wp.launch(
-                kernel=_bilinear_interpolation,
-                dim=self.points.shape[0],
-                inputs=[
-                    self.x_wp,
-                    self.y_wp,
-                    self.q_cuda,
-                    self.z_cuda,
-                ],
-                device="cuda",
-            )
-            self.points[:, -1] = self.z_cuda.numpy()
+        with wp.ScopedTimer("sample_bilinear_GPU", active=self.profiling):
+            self.sample_GPU()
 
     def bicubic_interpolation_GPU(self) -> None:
         """
         Perform bicubic interpolation using the "gpu" mode.
         """
 
-        with wp.ScopedTimer("get_values_wp_4x4_GPU", active=self.profiling):
-            wp.launch(
-                kernel=_get_values_wp_4x4,
-                dim=self.points.shape[0],
-                inputs=[
-                    self.dem_wp,
-                    self.dem_shape_wp,
-                    self.x_wp,
-                    self.y_wp,
-                    self.q_cuda,
-                ],
-                device="cuda",
-            )
+        with wp.ScopedTimer("sample_bicubic_GPU", active=self.profiling):
+            self.sample_GPU()
 
-        with wp.ScopedTimer("bicubic_interpolation_GPU", active=self.profiling):
-            wp.launch(
-                kernel=_bicubic_interpolation,
-                dim=self.points.shape[0],
-                inputs=[
-                    self.x_wp,
-                    self.y_wp,
-                    self.q_cuda,
-                    self.coeffs_wp,
-                    self.z_cuda,
-                ],
-                device="cuda",
-            )
-            self.points[:, -1] = self.z_cuda.numpy()
+    def sample_GPU(self) -> None:
+        """
+        Enqueue the sampling of the DEM at the offset stored in coords_cpu. The elevation is written
+        to z_cpu, and copy_event is recorded once it is available.
+
+        When CUDA graphs are enabled, the first call runs the sampling directly, which also loads
+        the kernel, and then records it. The following calls replay the recorded graph. The graph
+        reads the buffers by address, so updating the DEM in place with update_DEM keeps it valid.
+        """
+
+        if not self.use_cuda_graph:
+            self.enqueue_sampling_GPU()
+        elif self.sampling_graph is None:
+            self.enqueue_sampling_GPU()
+            with wp.ScopedCapture(device="cuda") as capture:
+                self.enqueue_sampling_GPU()
+            self.sampling_graph = capture.graph
+        else:
+            wp.capture_launch(self.sampling_graph)
+        wp.record_event(self.copy_event)
+
+    def fetch_elevation(self) -> None:
+        """
+        Wait for the elevation enqueued by enqueue_elevation and write it to the mesh backbone.
+        This is a no-op in "hybrid" mode.
+        """
+
+        if self.acceleration_mode == "gpu":
+            with wp.ScopedTimer("fetch_elevation_GPU", active=self.profiling):
+                wp.synchronize_event(self.copy_event)
+                self.points[:, -1] = self.z_cpu.numpy()
+
+    def enqueue_sampling_GPU(self) -> None:
+        """
+        Enqueue the upload of the offset, the sampling kernel and the download of the elevation.
+        """
+
+        wp.copy(self.coords_wp, self.coords_cpu)
+        wp.launch(
+            kernel=self.sampling_kernel,
+            dim=self.points.shape[0],
+            inputs=[
+                self.points_x_wp,
+                self.points_y_wp,
+                self.coords_wp,
+                self.inv_mpp,
+                self.dem_wp,
+                self.dem_scale_wp,
+                self.z_cuda,
+            ],
+            device="cuda",
+        )
+        wp.copy(self.z_cpu, self.z_cuda)
 
     def bilinear_interpolation_and_normal_CPU(
         self,
@@ -604,7 +699,7 @@ class DEMSampler:
                         x_wp,
                         y_wp,
                         coords_wp,
-                        self.specs.source_resolution,
+                        self.inv_mpp,
                         map_offset_wp,
                     ],
                     device="cpu",
@@ -614,8 +709,9 @@ class DEMSampler:
                     kernel=_get_values_wp_2x2,
                     dim=x.shape[0],
                     inputs=[
-                        self.dem_wp.flatten(),
+                        self.dem_host_wp.flatten(),
                         self.dem_shape_wp,
+                        self.dem_host_strides_wp,
                         x_wp,
                         y_wp,
                         q,
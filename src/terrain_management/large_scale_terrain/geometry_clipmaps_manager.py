@@ -47,6 +47,9 @@ class GeoClipmapManager:
         cfg: GeoClipmapManagerConf,
         interpolation_method: str = "bilinear",
         acceleration_mode: str = "hybrid",
+        dem_precision: str = "float32",
+        transpose_dem: bool = True,
+        use_cuda_graph: bool = True,
         name_prefix: str = "",
         profiling: bool = False,
         stage: Usd.Stage = None,
@@ -56,6 +59,9 @@ class GeoClipmapManager:
             cfg (GeoClipmapManagerConf): configuration for the clipmap.
             interpolation_method (str): method to use for interpolation.
             acceleration_mode (str): mode to use for acceleration.
+            dem_precision (str): precision used to store the DEM on the GPU. Only used in "gpu" mode.
+            transpose_dem (bool): flag to store the DEM transposed on the GPU. Only used in "gpu" mode.
+            use_cuda_graph (bool): flag to replay the sampling from a CUDA graph. Only used in "gpu" mode.
             name_prefix (str): prefix to add to the mesh name.
         """
 
@@ -63,6 +69,9 @@ class GeoClipmapManager:
             cfg.geo_clipmap_specs,
             interpolation_method=interpolation_method,
             acceleration_mode=acceleration_mode,
+            dem_precision=dem_precision,
+            transpose_dem=transpose_dem,
+            use_cuda_graph=use_cuda_graph,
             profiling=profiling,
         )
         self._root_path = cfg.root_path
@@ -108,14 +117,36 @@ class GeoClipmapManager:
             mesh_position (np.ndarray): position of the mesh (in meters).
         """
         with wp.ScopedTimer("complete update loop", active=self.profiling):
-            self._geo_clipmap.update_elevation(position)
-            with wp.ScopedTimer("mesh update", active=self.profiling):
-                self.render_mesh(
-                    self._geo_clipmap.points,
-                    self._geo_clipmap.indices,
-                    self._geo_clipmap.uvs,
-                    update_topology=self.update_topology,
-                )
+            self.enqueue_geoclipmap_update(position)
+            self.finish_geoclipmap_update(mesh_position)
+
+    def enqueue_geoclipmap_update(self, position: np.ndarray) -> None:
+        """
+        Starts updating the elevation of the clipmap at the given position.
+        finish_geoclipmap_update must be called to update the mesh.
+
+        Args:
+            position (np.ndarray): position to use for the update (in meters).
+        """
+
+        self._geo_clipmap.enqueue_elevation(position)
+
+    def finish_geoclipmap_update(self, mesh_position: np.ndarray) -> None:
+        """
+        Waits for the elevation requested by enqueue_geoclipmap_update, and updates the mesh.
+
+        Args:
+            mesh_position (np.ndarray): position of the mesh (in meters).
+        """
+
+        self._geo_clipmap.fetch_elevation()
+        with wp.ScopedTimer("mesh update", active=self.profiling):
+            self.render_mesh(
+                self._geo_clipmap.points,
+                self._geo_clipmap.indices,
+                self._geo_clipmap.uvs,
+                update_topology=self.update_topology,
+            )
         self.move_mesh(mesh_position)
         self.update_topology = False
 
@@ -254,3 +254,57 @@ def _build_mesh(start_level, num_levels, meshBaseLODExtentHeightfieldTexels):
         prev_indices = new_indices.copy()
         new_indices = nb.typed.Dict.empty(key_type=point2, value_type=nb.types.int32)
     return points, uvs, indices
+
+
+@nb.jit(nopython=True, parallel=True, cache=True)
+def _get_values_2x2(dem, x, y, out):
+    """
+    Gets all the 2x2 DEM patches from the array of x and y coordinates.
+    This is the CPU counterpart of the Warp _get_values_wp_2x2 kernel used in the "hybrid" mode.
+    Warp runs CPU kernels serially, while the points are processed in parallel here.
+    The coordinates must already be clamped to the DEM shape.
+
+    Args:
+        dem (np.ndarray): DEM (shape[0], shape[1]).
+        x (np.ndarray): x coordinates (in pixels) (num_points, ).
+        y (np.ndarray): y coordinates (in pixels) (num_points, ).
+        out (np.ndarray): output patches (num_points, 2, 2).
+    """
+
+    x_max = dem.shape[0] - 1
+    y_max = dem.shape[1] - 1
+    for tid in nb.prange(x.shape[0]):
+        x0 = int(x[tid])
+        y0 = int(y[tid])
+        x1 = min(x0 + 1, x_max)
+        y1 = min(y0 + 1, y_max)
+        out[tid, 0, 0] = dem[x0, y0]
+        out[tid, 1, 0] = dem[x1, y0]
+        out[tid, 0, 1] = dem[x0, y1]
+        out[tid, 1, 1] = dem[x1, y1]
+
+
+@nb.jit(nopython=True, parallel=True, cache=True)
+def _get_values_4x4(dem, x, y, out):
+    """
+    Gets all the 4x4 DEM patches from the array of x and y coordinates.
+    This is the CPU counterpart of the Warp _get_values_wp_4x4 kernel used in the "hybrid" mode.
+    Warp runs CPU kernels serially, while the points are processed in parallel here.
+    The coordinates must already be clamped to the DEM shape.
+
+    Args:
+        dem (np.ndarray): DEM (shape[0], shape[1]).
+        x (np.ndarray): x coordinates (in pixels) (num_points, ).
+        y (np.ndarray): y coordinates (in pixels) (num_points, ).
+        out (np.ndarray): output patches (num_points, 4, 4).
+    """
+
+    x_max = dem.shape[0] - 1
+    y_max = dem.shape[1] - 1
+    for tid in nb.prange(x.shape[0]):
+        x0 = max(int(x[tid]) - 1, 0)
+        y0 = max(int(y[tid]) - 1, 0)
+        for i in range(4):
+            xi = min(x0 + i, x_max)
+            for j in range(4):
+                out[tid, i, j] = dem[xi, min(y0 + j, y_max)]
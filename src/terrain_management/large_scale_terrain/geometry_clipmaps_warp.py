@@ -6,6 +6,8 @@ __maintainer__ = "Antoine Richard"
 __email__ = "antoine.richard@uni.lu"
 __status__ = "development"
 
+from typing import Any, Tuple
+import functools
 import warp as wp
 
 
@@ -13,9 +15,10 @@ import warp as wp
 def _preprocess(
     x: wp.array(dtype=float),
     y: wp.array(dtype=float),
-    points: wp.array(dtype=wp.vec2f),
+    points_x: wp.array(dtype=float),
+    points_y: wp.array(dtype=float),
     coord: wp.vec2f,
-    mpp: float,
+    inv_mpp: float,
     dem_shape: wp.vec2f,
 ):
     """
@@ -26,25 +29,23 @@ def _preprocess(
     Args:
         x (wp.array(dtype=float)): x coordinates of the points (this is the output).
         y (wp.array(dtype=float)): y coordinates of the points (this is the output).
-        points (wp.array(dtype=wp.vec2f)): points to query.
+        points_x (wp.array(dtype=float)): x coordinates of the points to query.
+        points_y (wp.array(dtype=float)): y coordinates of the points to query.
         coord (wp.vec2f): offset to add to the coordinates.
-        mpp (float): meters per pixel.
+        inv_mpp (float): pixels per meter (inverse of the meters per pixel).
         dem_shape (wp.vec2f): shape of the DEM.
     """
 
     tid = wp.tid()
-    x[tid] = points[tid][0] / mpp + coord[0]
-    y[tid] = points[tid][1] / mpp + coord[1]
-    x[tid] = wp.atomic_min(x, tid, dem_shape[0] - 1.0)
-    y[tid] = wp.atomic_min(y, tid, dem_shape[1] - 1.0)
-    x[tid] = wp.atomic_max(x, tid, 0.0)
-    y[tid] = wp.atomic_max(y, tid, 0.0)
+    x[tid] = wp.clamp(points_x[tid] * inv_mpp + coord[0], 0.0, dem_shape[0] - 1.0)
+    y[tid] = wp.clamp(points_y[tid] * inv_mpp + coord[1], 0.0, dem_shape[1] - 1.0)
 
 
 @wp.func
 def _get_4x4_mat(
-    dem: wp.array(dtype=float),
+    dem: wp.array(dtype=Any),
     dem_shape: wp.vec2i,
+    dem_strides: wp.vec2i,
     x: float,
     y: float,
     out: wp.mat44f,
@@ -52,40 +53,45 @@ def _get_4x4_mat(
     """
     Gets a patch of 4x4 values from the DEM centered at the given coordinates (x, y).
     The function automatically clamps the coordinates to the DEM shape.
+    The strides allow to read from a row-major (shape[1], 1) or a column-major (1, shape[0]) DEM.
+    The DEM can be stored with any scalar type, the values are promoted to float when loaded.
 
     Args:
-        dem (wp.array(dtype=float)): DEM.
+        dem (wp.array(dtype=Any)): DEM.
         dem_shape (wp.vec2i): shape of the DEM.
+        dem_strides (wp.vec2i): strides of the DEM along x and y (in elements).
         x (float): x coordinate.
         y (float): y coordinate.
         out (wp.mat44f): output matrix.
     """
 
-    x0 = wp.max(int(x) - 1, 0)
-    y0 = wp.max(int(y) - 1, 0)
-    x1 = wp.min(x0 + 1, dem_shape[0] - 1) * dem_shape[1]
-    x2 = wp.min(x0 + 2, dem_shape[0] - 1) * dem_shape[1]
-    x3 = wp.min(x0 + 3, dem_shape[0] - 1) * dem_shape[1]
-    x0 = x0 * dem_shape[1]
-    y1 = wp.min(y0 + 1, dem_shape[1] - 1)
-    y2 = wp.min(y0 + 2, dem_shape[1] - 1)
-    y3 = wp.min(y0 + 3, dem_shape[1] - 1)
-    out[0, 0] = dem[x0 + y0]
-    out[1, 0] = dem[x1 + y0]
-    out[2, 0] = dem[x2 + y0]
-    out[3, 0] = dem[x3 + y0]
-    out[0, 1] = dem[x0 + y1]
-    out[1, 1] = dem[x1 + y1]
-    out[2, 1] = dem[x2 + y1]
-    out[3, 1] = dem[x3 + y1]
-    out[0, 2] = dem[x0 + y2]
-    out[1, 2] = dem[x1 + y2]
-    out[2, 2] = dem[x2 + y2]
-    out[3, 2] = dem[x3 + y2]
-    out[0, 3] = dem[x0 + y3]
-    out[1, 3] = dem[x1 + y3]
-    out[2, 3] = dem[x2 + y3]
-    out[3, 3] = dem[x3 + y3]
+    # Offsets are built incrementally from the first row/column, and clamped to the last one.
+    x_max = (dem_shape[0] - 1) * dem_strides[0]
+    y_max = (dem_shape[1] - 1) * dem_strides[1]
+    x0 = wp.max(int(x) - 1, 0) * dem_strides[0]
+    y0 = wp.max(int(y) - 1, 0) * dem_strides[1]
+    x1 = wp.min(x0 + dem_strides[0], x_max)
+    x2 = wp.min(x1 + dem_strides[0], x_max)
+    x3 = wp.min(x2 + dem_strides[0], x_max)
+    y1 = wp.min(y0 + dem_strides[1], y_max)
+    y2 = wp.min(y1 + dem_strides[1], y_max)
+    y3 = wp.min(y2 + dem_strides[1], y_max)
+    out[0, 0] = float(dem[x0 + y0])
+    out[1, 0] = float(dem[x1 + y0])
+    out[2, 0] = float(dem[x2 + y0])
+    out[3, 0] = float(dem[x3 + y0])
+    out[0, 1] = float(dem[x0 + y1])
+    out[1, 1] = float(dem[x1 + y1])
+    out[2, 1] = float(dem[x2 + y1])
+    out[3, 1] = float(dem[x3 + y1])
+    out[0, 2] = float(dem[x0 + y2])
+    out[1, 2] = float(dem[x1 + y2])
+    out[2, 2] = float(dem[x2 + y2])
+    out[3, 2] = float(dem[x3 + y2])
+    out[0, 3] = float(dem[x0 + y3])
+    out[1, 3] = float(dem[x1 + y3])
+    out[2, 3] = float(dem[x2 + y3])
+    out[3, 3] = float(dem[x3 + y3])
     return out
 
 
@@ -93,6 +99,7 @@ def _get_4x4_mat(
 def _get_values_wp_4x4(
     dem: wp.array(dtype=float),
     dem_shape: wp.vec2i,
+    dem_strides: wp.vec2i,
     x: wp.array(dtype=float),
     y: wp.array(dtype=float),
     out: wp.array(dtype=wp.mat44f),
@@ -103,19 +110,21 @@ def _get_values_wp_4x4(
     Args:
         dem (wp.array(dtype=float)): DEM.
         dem_shape (wp.vec2i): shape of the DEM.
+        dem_strides (wp.vec2i): strides of the DEM along x and y (in elements).
         x (wp.array(dtype=float)): x coordinates.
         y (wp.array(dtype=float)): y coordinates.
         out (wp.array(dtype=wp.mat44f)): output
     """
 
     tid = wp.tid()
-    out[tid] = _get_4x4_mat(dem, dem_shape, x[tid], y[tid], out[tid])
+    out[tid] = _get_4x4_mat(dem, dem_shape, dem_strides, x[tid], y[tid], out[tid])
 
 
 @wp.func
 def _get_2x2_mat(
-    dem: wp.array(dtype=float),
+    dem: wp.array(dtype=Any),
     dem_shape: wp.vec2i,
+    dem_strides: wp.vec2i,
     x: float,
     y: float,
     out: wp.mat22f,
@@ -123,24 +132,26 @@ def _get_2x2_mat(
     """
     Gets a patch of 2x2 values from the DEM centered at the given coordinates (x, y).
     The function automatically clamps the coordinates to the DEM shape.
+    The strides allow to read from a row-major (shape[1], 1) or a column-major (1, shape[0]) DEM.
+    The DEM can be stored with any scalar type, the values are promoted to float when loaded.
 
     Args:
-        dem (wp.array(dtype=float)): DEM.
+        dem (wp.array(dtype=Any)): DEM.
         dem_shape (wp.vec2i): shape of the DEM.
+        dem_strides (wp.vec2i): strides of the DEM along x and y (in elements).
         x (float): x coordinate.
         y (float): y coordinate.
         out (wp.mat22f): output matrix.
     """
 
-    x0 = int(x)
-    y0 = int(y)
-    x1 = wp.min(x0 + 1, dem_shape[0] - 1) * dem_shape[1]
-    x0 = x0 * dem_shape[1]
-    y1 = wp.min(y0 + 1, dem_shape[1] - 1)
-    out[0, 0] = dem[x0 + y0]
-    out[1, 0] = dem[x1 + y0]
-    out[0, 1] = dem[x0 + y1]
-    out[1, 1] = dem[x1 + y1]
+    x0 = int(x) * dem_strides[0]
+    y0 = int(y) * dem_strides[1]
+    x1 = wp.min(x0 + dem_strides[0], (dem_shape[0] - 1) * dem_strides[0])
+    y1 = wp.min(y0 + dem_strides[1], (dem_shape[1] - 1) * dem_strides[1])
+    out[0, 0] = float(dem[x0 + y0])
+    out[1, 0] = float(dem[x1 + y0])
+    out[0, 1] = float(dem[x0 + y1])
+    out[1, 1] = float(dem[x1 + y1])
     return out
 
 
@@ -148,6 +159,7 @@ def _get_2x2_mat(
 def _get_values_wp_2x2(
     dem: wp.array(dtype=float),
     dem_shape: wp.vec2i,
+    dem_strides: wp.vec2i,
     x: wp.array(dtype=float),
     y: wp.array(dtype=float),
     out: wp.array(dtype=wp.mat22f),
@@ -158,13 +170,14 @@ def _get_values_wp_2x2(
     Args:
         dem (wp.array(dtype=float)): DEM.
         dem_shape (wp.vec2i): shape of the DEM.
+        dem_strides (wp.vec2i): strides of the DEM along x and y (in elements).
         x (wp.array(dtype=float)): x coordinates.
         y (wp.array(dtype=float)): y coordinates.
         out (wp.array(dtype=wp.mat22f)): output
     """
 
     tid = wp.tid()
-    out[tid] = _get_2x2_mat(dem, dem_shape, x[tid], y[tid], out[tid])
+    out[tid] = _get_2x2_mat(dem, dem_shape, dem_strides, x[tid], y[tid], out[tid])
 
 
 @wp.func
@@ -211,23 +224,47 @@ def _bilinear_interpolation(
 @wp.func
 def _cubic_interpolator(
     x: float,
-    coeffs: wp.vec4f,
-):
+) -> wp.vec4f:
     """
     Cubic interpolation of a single point.
+    Computes the 4 coefficients of the cubic convolution kernel (a = -0.5).
 
     Args:
         x (float): x coordinate.
-        coeffs (wp.vec4f): coefficients.
+
+    Returns:
+        wp.vec4f: coefficients.
     """
 
-    x2 = x - wp.trunc(x)
-    a = -0.5
-    coeffs[0] = a * (x2 * (1.0 - x2 * (2.0 - x2)))
-    coeffs[1] = a * (-2.0 + x2 * x2 * (5.0 - 3.0 * x2))
-    coeffs[2] = a * (x2 * (-1.0 + x2 * (-4.0 + 3.0 * x2)))
-    coeffs[3] = a * (x2 * x2 * (1.0 - x2))
-    return coeffs
+    x1 = x - wp.trunc(x)
+    x2 = x1 * x1
+    x3 = x2 * x1
+    return wp.vec4f(
+        -0.5 * (x1 - 2.0 * x2 + x3),
+        -0.5 * (-2.0 + 5.0 * x2 - 3.0 * x3),
+        -0.5 * (-x1 - 4.0 * x2 + 3.0 * x3),
+        -0.5 * (x2 - x3),
+    )
+
+
+@wp.func
+def _bicubic_interpolator(
+    x: float,
+    y: float,
+    q: wp.mat44f,
+):
+    """
+    Bicubic interpolation of a single point.
+    The patch is first interpolated along x, cx^T q, and the resulting row is then
+    interpolated along y. Both reductions are Warp built-ins, which compile to chains of FMAs.
+
+    Args:
+        x (float): x coordinate.
+        y (float): y coordinate.
+        q (wp.mat44f): 4x4 matrix.
+    """
+
+    return wp.dot(_cubic_interpolator(x) * q, _cubic_interpolator(y))
 
 
 @wp.kernel
@@ -235,7 +272,6 @@ def _bicubic_interpolation(
     x: wp.array(dtype=float),
     y: wp.array(dtype=float),
     q: wp.array(dtype=wp.mat44f),
-    coeffs: wp.array(dtype=wp.vec4f),
     out: wp.array(dtype=float),
 ):
     """
@@ -245,38 +281,108 @@ def _bicubic_interpolation(
         x (wp.array(dtype=float)): x coordinates.
         y (wp.array(dtype=float)): y coordinates.
         q (wp.array(dtype=wp.mat44f)): 4x4 matrices.
-        coeffs (wp.array(dtype=wp.vec4f)): coefficients.
         out (wp.array(dtype=float)): output.
     """
 
     tid = wp.tid()
-    coeffs[tid] = _cubic_interpolator(x[tid], coeffs[tid])
-    a0 = (
-        q[tid][0, 0] * coeffs[tid][0]
-        + q[tid][1, 0] * coeffs[tid][1]
-        + q[tid][2, 0] * coeffs[tid][2]
-        + q[tid][3, 0] * coeffs[tid][3]
-    )
-    a1 = (
-        q[tid][0, 1] * coeffs[tid][0]
-        + q[tid][1, 1] * coeffs[tid][1]
-        + q[tid][2, 1] * coeffs[tid][2]
-        + q[tid][3, 1] * coeffs[tid][3]
-    )
-    a2 = (
-        q[tid][0, 2] * coeffs[tid][0]
-        + q[tid][1, 2] * coeffs[tid][1]
-        + q[tid][2, 2] * coeffs[tid][2]
-        + q[tid][3, 2] * coeffs[tid][3]
-    )
-    a3 = (
-        q[tid][0, 3] * coeffs[tid][0]
-        + q[tid][1, 3] * coeffs[tid][1]
-        + q[tid][2, 3] * coeffs[tid][2]
-        + q[tid][3, 3] * coeffs[tid][3]
-    )
-    coeffs[tid] = _cubic_interpolator(y[tid], coeffs[tid])
-    out[tid] = a0 * coeffs[tid][0] + a1 * coeffs[tid][1] + a2 * coeffs[tid][2] + a3 * coeffs[tid][3]
+    out[tid] = _bicubic_interpolator(x[tid], y[tid], q[tid])
+
+
+@functools.lru_cache(maxsize=None)
+def _create_sampling_kernel(
+    interpolation_method: str,
+    dem_shape: Tuple[int, int],
+    dem_strides: Tuple[int, int],
+    dem_dtype: type = float,
+) -> wp.Kernel:
+    """
+    Creates a kernel that samples the DEM at the given points.
+    The kernel fuses the pre-processing, the gathering of the patches and the interpolation.
+    The intermediate values are kept in registers.
+    The shape and strides of the DEM are captured as compile-time constants, such that
+    the bounds and the row offsets are folded by the compiler. A kernel is thus specialized
+    for a given DEM layout. Each specialization is compiled in its own Warp module, so adding
+    one does not change the hash of this module and does not recompile its other kernels.
+    The kernels are cached, such that samplers sharing a DEM layout, or rebuilt for a DEM of the
+    same shape, reuse the kernel instead of building a new one. Warp keeps the loaded modules
+    registered for the lifetime of the process, so the cache is not bounded: evicting a kernel
+    would not free it.
+    The offset is read from a device array rather than passed by value, such that the launch
+    can be recorded once in a CUDA graph and replayed with a new offset every frame.
+    The DEM can be stored quantized, the elevation is then recovered as z = value * scale + offset.
+    Since the interpolation weights sum to one, the scale and offset are applied once, after the interpolation.
+
+    Args:
+        interpolation_method (str): method to use for interpolation. Can be "bilinear" or "bicubic".
+        dem_shape (Tuple[int, int]): shape of the DEM. Must be hashable.
+        dem_strides (Tuple[int, int]): strides of the DEM along x and y (in elements). Must be hashable.
+        dem_dtype (type): type of the values stored in the DEM, e.g. float or wp.int16.
+
+    Returns:
+        wp.Kernel: the sampling kernel. Its arguments are:
+            points_x (wp.array(dtype=float)): x coordinates of the points to query.
+            points_y (wp.array(dtype=float)): y coordinates of the points to query.
+            coord (wp.array(dtype=wp.vec2f)): single element array holding the offset to add to the coordinates.
+            inv_mpp (float): pixels per meter (inverse of the meters per pixel).
+            dem (wp.array(dtype=dem_dtype)): DEM.
+            dem_scale (wp.array(dtype=wp.vec2f)): single element array holding the scale and offset of the DEM.
+            out (wp.array(dtype=float)): output.
+
+    Raises:
+        ValueError: if the interpolation method is not supported.
+    """
+
+    shape_x = int(dem_shape[0])
+    shape_y = int(dem_shape[1])
+    stride_x = int(dem_strides[0])
+    stride_y = int(dem_strides[1])
+    max_x = float(shape_x - 1)
+    max_y = float(shape_y - 1)
+
+    if interpolation_method == "bilinear":
+
+        @wp.kernel(module="unique")
+        def _sample_bilinear(
+            points_x: wp.array(dtype=float),
+            points_y: wp.array(dtype=float),
+            coord: wp.array(dtype=wp.vec2f),
+            inv_mpp: float,
+            dem: wp.array(dtype=dem_dtype),
+            dem_scale: wp.array(dtype=wp.vec2f),
+            out: wp.array(dtype=float),
+        ):
+            tid = wp.tid()
+            offset = coord[0]
+            x = wp.clamp(points_x[tid] * inv_mpp + offset[0], 0.0, max_x)
+            y = wp.clamp(points_y[tid] * inv_mpp + offset[1], 0.0, max_y)
+            q = _get_2x2_mat(dem, wp.vec2i(shape_x, shape_y), wp.vec2i(stride_x, stride_y), x, y, wp.mat22f())
+            scale = dem_scale[0]
+            out[tid] = _bilinear_interpolator(x, y, q) * scale[0] + scale[1]
+
+        return _sample_bilinear
+    elif interpolation_method == "bicubic":
+
+        @wp.kernel(module="unique")
+        def _sample_bicubic(
+            points_x: wp.array(dtype=float),
+            points_y: wp.array(dtype=float),
+            coord: wp.array(dtype=wp.vec2f),
+            inv_mpp: float,
+            dem: wp.array(dtype=dem_dtype),
+            dem_scale: wp.array(dtype=wp.vec2f),
+            out: wp.array(dtype=float),
+        ):
+            tid = wp.tid()
+            offset = coord[0]
+            x = wp.clamp(points_x[tid] * inv_mpp + offset[0], 0.0, max_x)
+            y = wp.clamp(points_y[tid] * inv_mpp + offset[1], 0.0, max_y)
+            q = _get_4x4_mat(dem, wp.vec2i(shape_x, shape_y), wp.vec2i(stride_x, stride_y), x, y, wp.mat44f())
+            scale = dem_scale[0]
+            out[tid] = _bicubic_interpolator(x, y, q) * scale[0] + scale[1]
+
+        return _sample_bicubic
+    else:
+        raise ValueError("Invalid interpolation method")
 
 
 @wp.func
@@ -308,13 +414,13 @@ def _normal_on_grid(q: wp.mat22f, grid_size: float) -> wp.vec3f:
     u = (u0, u1, u2), v = (v0, v1, v2)
     u x v = (u1v2 - u2v1, u2v0 - u0v2, u0v1 - u1v0)
 
-    r1 = (-(b_z - a_z) * grid_size, -(c_z - a_z) * grid_size, grid_size * grid_size)
-    r2 = (-(c_z - d_z) * grid_size, -(b_z - d_z) * grid_size, -grid_size * grid_size)
+    r1 = ((c_z - a_z) * grid_size, (b_z - a_z) * grid_size, -grid_size * grid_size)
+    r2 = ((b_z - d_z) * grid_size, (c_z - d_z) * grid_size, grid_size * grid_size)
 
     Take the average:
     Flip r1 to ensure both vectors are pointing up (they can't point down since the surface is always oriented upwards)
-    (-r1 + r2) / 2 = ( grid_size * (-b_z + a_z + c_z - d_z) / 2,
-                       grid_size * (-c_z + a_z + b_z - d_z) / 2,
+    (-r1 + r2) / 2 = ( grid_size * (a_z + b_z - c_z - d_z) / 2,
+                       grid_size * (a_z + c_z - b_z - d_z) / 2,
                        grid_size * grid_size)
 
     Args:
@@ -322,15 +428,13 @@ def _normal_on_grid(q: wp.mat22f, grid_size: float) -> wp.vec3f:
         grid_size (float): grid size.
 
     Returns:
-        wp.vec3f: normal vector.
+        wp.vec3f: unit normal vector.
     """
 
-    vec = wp.vec3f(
-        grid_size / 2.0 * (-q[1, 0] + q[0, 0] + q[0, 1] - q[1, 1]),
-        grid_size / 2.0 * (-q[0, 1] + q[0, 0] + q[1, 0] - q[1, 1]),
-        grid_size * grid_size,
-    )
-    return vec / wp.length(vec)
+    h = grid_size * 0.5
+    s = q[0, 0] - q[1, 1]
+    vec = wp.vec3f(h * (s + q[0, 1] - q[1, 0]), h * (s + q[1, 0] - q[0, 1]), grid_size * grid_size)
+    return wp.normalize(vec)
 
 
 @wp.kernel
@@ -338,7 +442,7 @@ def _preprocess_multi_points(
     x: wp.array(dtype=float),
     y: wp.array(dtype=float),
     coord: wp.vec2f,
-    mpp: float,
+    inv_mpp: float,
     map_offset: wp.vec2f,
 ):
     """
@@ -351,13 +455,13 @@ def _preprocess_multi_points(
         x (wp.array(dtype=float)): x coordinates of the points (this is the output).
         y (wp.array(dtype=float)): y coordinates of the points (this is the output).
         coord (wp.vec2f): offset to remove from the coordinates.
-        mpp (float): meters per pixel.
+        inv_mpp (float): pixels per meter (inverse of the meters per pixel).
         map_offset (wp.vec2f): offset to add to the coordinates.
     """
 
     tid = wp.tid()
-    x[tid] = (x[tid] - coord[0] + map_offset[0]) / mpp
-    y[tid] = (y[tid] - coord[1] + map_offset[1]) / mpp
+    x[tid] = (x[tid] - coord[0] + map_offset[0]) * inv_mpp
+    y[tid] = (y[tid] - coord[1] + map_offset[1]) * inv_mpp
 
 
 @wp.kernel
@@ -398,10 +502,12 @@ def _get_random_tangent_vector(normal: wp.vec3f, state: wp.uint32) -> wp.quatf:
     Generates a random tangent vector to the normal vector.
     Using the normal vector, we build a base (vx, vy, normal) that will provide
     a random rotation around that vector.
-    To do that, we first generate a random vector vx, and then get the closest vector
-    to vx that is orthogonal to the normal vector. Then we repeat the process to get
-    vy a vector that is orthogonal to both the normal and vx.
-    From there we can build a rotation matrix and convert it to a quaternion.
+    To do that, we first build an orthonormal base (t1, t2, normal) without branching,
+    following "Building an Orthonormal Basis, Revisited" (Duff et al., 2017). This base is
+    well defined for any unit normal, including (0, 0, -1). Then we draw a random angle and
+    rotate (t1, t2) around the normal to get (vx, vy).
+    From there we can build a rotation matrix whose columns are (vx, vy, normal), and
+    convert it to a quaternion.
 
     Args:
         normal (wp.vec3f): normal vector.
@@ -410,13 +516,25 @@ def _get_random_tangent_vector(normal: wp.vec3f, state: wp.uint32) -> wp.quatf:
     Returns:
         wp.quatf: random quaternion normal to the surface.
     """
-    vx = wp.vec3f(
-        wp.randf(state, -1.0, 1.0),
-        wp.randf(state + wp.uint32(1), -1.0, 1.0),
-        wp.randf(state + wp.uint32(2), -1.0, 1.0),
-    )
-    vx = wp.cross(normal, vx)
-    vx = vx / wp.length(vx)
+
+    sign = wp.sign(normal[2])
+    a = -1.0 / (sign + normal[2])
+    b = normal[0] * normal[1] * a
+    t1 = wp.vec3f(1.0 + sign * normal[0] * normal[0] * a, sign * b, -sign * normal[0])
+    t2 = wp.vec3f(b, sign + normal[1] * normal[1] * a, -normal[1])
+
+    theta = wp.randf(state, 0.0, 2.0 * wp.pi)
+    vx = wp.cos(theta) * t1 + wp.sin(theta) * t2
     vy = wp.cross(normal, vx)
-    mat = wp.mat33f(vx, vy, normal)
+    mat = wp.mat33f(
+        vx[0],
+        vy[0],
+        normal[0],
+        vx[1],
+        vy[1],
+        normal[1],
+        vx[2],
+        vy[2],
+        normal[2],
+    )
     return wp.quat_from_matrix(mat)
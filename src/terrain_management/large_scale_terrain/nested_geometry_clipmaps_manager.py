@@ -33,6 +33,10 @@ class NestedGeometryClipmapManagerConf:
         coarse_interpolation_method (str): The interpolation method for the coarse clipmap. (bicubic or bilinear)
         fine_acceleration_mode (str): The acceleration mode for the fine clipmap. (hybrid or gpu)
         coarse_acceleration_mode (str): The acceleration mode for the coarse clipmap. (hybrid or gpu)
+        fine_dem_precision (str): The precision of the fine DEM on the GPU. (float32 or int16, gpu mode only)
+        coarse_dem_precision (str): The precision of the coarse DEM on the GPU. (float32 or int16, gpu mode only)
+        transpose_dem (bool): Whether to store the DEMs transposed on the GPU. (gpu mode only)
+        use_cuda_graph (bool): Whether to replay the DEM sampling from a CUDA graph. (gpu mode only)
         profiling (bool): Whether to profile the clipmap manager.
         semantic_label (str): The semantic label of the terrain. (None if no label is to be used)
         texture_name (str): The name of the texture. (None if no texture is to be used)
@@ -45,6 +49,10 @@ class NestedGeometryClipmapManagerConf:
     coarse_interpolation_method: str = dataclasses.field(default_factory=str)
     fine_acceleration_mode: str = dataclasses.field(default_factory=str)
     coarse_acceleration_mode: str = dataclasses.field(default_factory=str)
+    fine_dem_precision: str = "float32"
+    coarse_dem_precision: str = "float32"
+    transpose_dem: bool = True
+    use_cuda_graph: bool = True
     profiling: bool = dataclasses.field(default_factory=bool)
     semantic_label: str = dataclasses.field(default_factory=str)
     texture_name: str = dataclasses.field(default_factory=str)
@@ -59,6 +67,8 @@ class NestedGeometryClipmapManagerConf:
         assert self.coarse_interpolation_method in ["bicubic", "bilinear"]
         assert self.fine_acceleration_mode in ["hybrid", "gpu"]
         assert self.coarse_acceleration_mode in ["hybrid", "gpu"]
+        assert self.fine_dem_precision in ["float32", "int16"]
+        assert self.coarse_dem_precision in ["float32", "int16"]
 
         if self.semantic_label == "":
             self.semantic_label = None
@@ -176,6 +186,9 @@ class NestedGeometryClipmapManager:
             self.fine_clipmap_manager_cfg,
             interpolation_method=self.settings.fine_interpolation_method,
             acceleration_mode=self.settings.fine_acceleration_mode,
+            dem_precision=self.settings.fine_dem_precision,
+            transpose_dem=self.settings.transpose_dem,
+            use_cuda_graph=self.settings.use_cuda_graph,
             name_prefix="_fine",
             profiling=self.settings.profiling,
             stage=self.stage,
@@ -184,6 +197,9 @@ class NestedGeometryClipmapManager:
             self.coarse_clipmap_manager_cfg,
             interpolation_method=self.settings.coarse_interpolation_method,
             acceleration_mode=self.settings.coarse_acceleration_mode,
+            dem_precision=self.settings.coarse_dem_precision,
+            transpose_dem=self.settings.transpose_dem,
+            use_cuda_graph=self.settings.use_cuda_graph,
             name_prefix="_coarse",
             profiling=self.settings.profiling,
             stage=self.stage,
@@ -201,6 +217,8 @@ class NestedGeometryClipmapManager:
     ) -> None:
         """
         Update the clipmaps geometry based on the given positions.
+        The sampling of both clipmaps is enqueued before any mesh is updated. This way, the
+        sampling of the coarse clipmap runs while the mesh of the fine clipmap is updated.
 
         Args:
             position_fine (Tuple[float, float]): The coordinates of the robot in the fine clipmap frame. (meters)
@@ -211,8 +229,10 @@ class NestedGeometryClipmapManager:
         position_fine = np.array(position_fine)
         position_coarse = np.array(position_coarse)
         mesh_position = np.array([mesh_position[0], mesh_position[1], 0])
-        self.fine_clipmap_manager.update_geoclipmap(position_fine, mesh_position)
-        self.coarse_clipmap_manager.update_geoclipmap(position_coarse, mesh_position)
+        self.fine_clipmap_manager.enqueue_geoclipmap_update(position_fine)
+        self.coarse_clipmap_manager.enqueue_geoclipmap_update(position_coarse)
+        self.fine_clipmap_manager.finish_geoclipmap_update(mesh_position)
+        self.coarse_clipmap_manager.finish_geoclipmap_update(mesh_position)
 
     def get_height_and_random_scale(
         self,
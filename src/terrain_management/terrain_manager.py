@@ -16,6 +16,12 @@ from pxr import UsdGeom, Sdf
 import omni
 import warp as wp
 
+try:
+    from usdrt import Usd as RtUsd, Vt as RtVt
+except ImportError:
+    RtUsd = None
+    RtVt = None
+
 from src.terrain_management.terrain_generation import GenerateProceduralMoonYard
 from src.configurations.procedural_terrain_confs import TerrainManagerConf
 from WorldBuilders import pxr_utils
@@ -43,6 +49,12 @@ class TerrainManager:
         self._texture_path = cfg.texture_path
         self._root_path = cfg.root_path
         self._augmentation = cfg.augmentation
+        self._force_threshold = cfg.moon_yard.deformation_engine.force_threshold
+        self._use_fabric = cfg.use_fabric
+        if self._use_fabric and RtUsd is None:
+            warnings.warn("usdrt is not available, the terrain mesh will be updated through USD.")
+            self._use_fabric = False
+        self._rt_stage = None
 
         self._dems = {}
         self._DEM = None
@@ -191,6 +203,8 @@ class TerrainManager:
         self._sim_verts = np.array(vertices, dtype=np.float32)
         self._sim_uvs = np.array(uvs, dtype=np.float32)
         self._sim_uvs = self._sim_uvs * self._grid_size
+        # View on the heights of the vertices, laid out like the DEM.
+        self._sim_heights = self._sim_verts[:, -1].reshape(self._sim_length, self._sim_width)
 
     def renderMesh(
         self,
@@ -242,6 +256,27 @@ class TerrainManager:
             self._id += 1
             pxr_utils.setDefaultOps(mesh, self._mesh_pos, self._mesh_rot, self._mesh_scale)
 
+    def updateMeshPointsFabric(self, points: np.ndarray) -> bool:
+        """
+        Updates the vertices of the mesh through USDRT, such that the new points are written to Fabric directly.
+        This skips the recomposition of the USD stage, but the points are not written back to USD.
+        The topology of the mesh must have been created beforehand using renderMesh.
+
+        Args:
+            points (np.ndarray): array of points to set as the mesh vertices.
+
+        Returns:
+            bool: True if the points were written to Fabric, False if the mesh is not available in Fabric.
+        """
+
+        if self._rt_stage is None:
+            self._rt_stage = RtUsd.Stage.Attach(omni.usd.get_context().get_stage_id())
+        prim = self._rt_stage.GetPrimAtPath(self._mesh_path)
+        if not prim.IsValid():
+            return False
+        prim.GetAttribute(UsdGeom.Tokens.points).Set(RtVt.Vec3fArray(points))
+        return True
+
     def updateTerrainCollider(self):
         """
         Updates the terrain collider. This function should be called after the terrain mesh is updated.
@@ -257,16 +292,17 @@ class TerrainManager:
 
         if update_collider:
             pxr_utils.deletePrim(self._stage, self._mesh_path)
-            self._sim_verts[:, -1] = np.flip(self._DEM, 0).flatten()
+            self._sim_heights[:] = self._DEM[::-1]
             with wp.ScopedTimer("mesh update"):
                 self.renderMesh(self._sim_verts, self._indices, self._sim_uvs, update_default_op=True)
             self.updateTerrainCollider()
             self.autoLabel()
             pxr_utils.applyMaterialFromPath(self._stage, self._mesh_path, self._texture_path)
         else:
-            self._sim_verts[:, -1] = np.flip(self._DEM, 0).flatten()
+            self._sim_heights[:] = self._DEM[::-1]
             with wp.ScopedTimer("mesh update"):
-                self.renderMesh(self._sim_verts, self._indices, self._sim_uvs)
+                if not (self._use_fabric and self.updateMeshPointsFabric(self._sim_verts)):
+                    self.renderMesh(self._sim_verts, self._indices, self._sim_uvs)
 
     def randomizeTerrain(self) -> None:
         """
@@ -278,18 +314,32 @@ class TerrainManager:
 
     def deformTerrain(
         self, world_positions: np.ndarray, world_orientations: np.ndarray, contact_forces: np.ndarray
-    ) -> None:
+    ) -> bool:
         """
         Deforms the terrain based on the given body transforms.
+        The links whose normal contact force is below the force threshold do not deform the terrain.
+        If none of them reaches it, the terrain is left untouched.
 
         Args:
             world_positions (np.ndarray): the world positions of the bodies.
             world_orientations (np.ndarray): the world orientations of the bodies.
             contact_forces (np.ndarray): the contact forces of the bodies.
+
+        Returns:
+            bool: True if the terrain was deformed, False otherwise.
         """
 
+        in_contact = np.abs(contact_forces[:, 2]) >= self._force_threshold
+        if not in_contact.any():
+            return False
+        if not in_contact.all():
+            # The depth regression has non-zero intercepts, so these links are removed rather than given a null force.
+            world_positions = world_positions[in_contact]
+            world_orientations = world_orientations[in_contact]
+            contact_forces = contact_forces[in_contact]
         self._DEM, self._mask = self._G.deform(world_positions, world_orientations, contact_forces)
         self.update(update_collider=False)
+        return True
 
     def loadTerrainByName(self, name: str) -> None:
         """